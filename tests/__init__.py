@@ -0,0 +1,13 @@
+"""Unit tests."""
+import os
+
+
+def get_html_contents(basefilename):
+    """Returns a saved page from tests/html.
+
+    :param str basefilename: File name, without .html.  Ex: put_INTC
+    :rtype: str
+    """
+    path = os.path.join(os.path.dirname(__file__), 'html', f'{basefilename}.html')
+    with open(path, encoding='utf-8') as html_file:
+        return html_file.read()
@@ -0,0 +1,125 @@
+"""Tests allocator.py"""
+import itertools
+import unittest
+from datetime import date
+
+import thewheel.allocator
+from thewheel.allocator import allocate
+from thewheel.putcontract import PutContract
+
+
+def _contract(stock, strike, bid, expiration=date(2022, 6, 17)):
+    return PutContract(stock, expiration, strike, -0.3, 0.4, bid)
+
+
+class ContractValueTestCase(unittest.TestCase):
+    """Tests contract_value"""
+    def test_premium(self):
+        contract = _contract('INTC', 45, 0.75)
+        self.assertAlmostEqual(75.0, thewheel.allocator.contract_value(contract))
+
+    def test_annualized(self):
+        contract = _contract('INTC', 45, 0.75, date(2022, 5, 20))
+        self.assertAlmostEqual(
+            75.0 * 365 / 10,
+            thewheel.allocator.contract_value(contract,
+                                              thewheel.allocator.ANNUALIZED,
+                                              date(2022, 5, 10)))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            thewheel.allocator.contract_value(_contract('INTC', 45, 0.75),
+                                              'bogus')
+
+
+class AllocateTestCase(unittest.TestCase):
+    """Tests allocate"""
+    def setUp(self):
+        self.contracts = [_contract('AAA', 10, 0.5),
+                          _contract('AAA', 15, 0.8),
+                          _contract('BBB', 7, 0.37),
+                          _contract('CCC', 12, 0.61)]
+
+    def _brute_force(self, cash, symbol_caps, sectors, sector_caps):
+        """Best premium, trying every quantity up to 7."""
+        best = 0.0
+        for quantities in itertools.product(range(8), repeat=len(self.contracts)):
+            symbol_cost = {}
+            sector_cost = {}
+            for contract, quantity in zip(self.contracts, quantities):
+                cost = contract.cost * quantity
+                symbol_cost[contract.stock] = \
+                    symbol_cost.get(contract.stock, 0) + cost
+                sector = sectors.get(contract.stock, contract.stock)
+                sector_cost[sector] = sector_cost.get(sector, 0) + cost
+            if sum(symbol_cost.values()) > cash:
+                continue
+            if any(cost > symbol_caps.get(symbol, cash)
+                   for symbol, cost in symbol_cost.items()):
+                continue
+            if any(cost > sector_caps.get(sector, cash)
+                   for sector, cost in sector_cost.items()):
+                continue
+            best = max(best, sum(contract.premium * quantity for contract, quantity
+                                 in zip(self.contracts, quantities)))
+        return best
+
+    def test_matches_brute_force(self):
+        sectors = {'BBB': 'cruise', 'CCC': 'cruise'}
+        for cash in (1500, 3000, 5000, 7700):
+            for symbol_caps in ({}, {'AAA': 1600}, {'AAA': 2500}):
+                sector_caps = {'cruise': 2000}
+                allocation = allocate(self.contracts, cash,
+                                      symbol_caps=symbol_caps,
+                                      sectors=sectors,
+                                      sector_caps=sector_caps)
+                expected = self._brute_force(cash, symbol_caps, sectors,
+                                             sector_caps)
+                self.assertAlmostEqual(expected, allocation.premium,
+                                       msg=f'cash={cash} caps={symbol_caps}')
+                self.assertAlmostEqual(allocation.premium, allocation.value)
+                self.assertLessEqual(allocation.cost, cash)
+
+    def test_positions(self):
+        # Two at 15 beat three at 10.
+        allocation = allocate(self.contracts[:2], 3000)
+        self.assertEqual([(self.contracts[1], 2)], allocation.positions)
+        self.assertAlmostEqual(160.0, allocation.premium)
+        self.assertAlmostEqual(3000.0, allocation.cost)
+        self.assertIn('  2x AAA', str(allocation))
+
+    def test_nothing_affordable(self):
+        allocation = allocate(self.contracts, 100)
+        self.assertEqual([], allocation.positions)
+        self.assertAlmostEqual(0.0, allocation.value)
+
+    def test_annualized(self):
+        short = _contract('AAA', 10, 0.2, date(2022, 5, 20))
+        long = _contract('AAA', 10, 0.5, date(2022, 8, 19))
+        allocation = allocate([short, long], 1000,
+                              thewheel.allocator.ANNUALIZED,
+                              today=date(2022, 5, 13))
+        self.assertEqual([(short, 1)], allocation.positions)
+
+    def test_many_candidates(self):
+        """Thousands of candidates never go over the caps."""
+        contracts = []
+        for symbol in range(20):
+            for expiry in range(8):
+                for strike in range(30):
+                    contracts.append(_contract(
+                        f'S{symbol}', 20 + symbol * 5 + strike * 0.5,
+                        0.2 + (symbol * 7 + expiry * 3 + strike) % 11 * 0.05,
+                        date.fromordinal(date(2022, 5, 13).toordinal() + 7 * expiry)))
+        symbol_caps = {f'S{symbol}': 20000 for symbol in range(20)}
+        allocation = allocate(contracts, 100000, symbol_caps=symbol_caps)
+        self.assertLessEqual(allocation.cost, 100000)
+        for symbol in symbol_caps:
+            self.assertLessEqual(sum(contract.cost * quantity for contract, quantity
+                                     in allocation.positions
+                                     if contract.stock == symbol), 20000)
+        self.assertGreater(allocation.premium, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
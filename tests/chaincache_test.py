@@ -0,0 +1,177 @@
+"""Tests chaincache.py"""
+import os
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from tests import get_html_contents
+import thewheel.chaincache
+import thewheel.options_api
+from thewheel.chaincache import ChainCache
+from thewheel.config import OptionType
+from thewheel.putcontract import PutContract
+
+
+def _contracts(stock, count):
+    return [PutContract(stock, date(2022, 5, 13 + index % 3),
+                        40.0 + index, -0.3, 0.5, 1.25, 1.3)
+            for index in range(count)]
+
+
+class PackTestCase(unittest.TestCase):
+    """Tests the binary format."""
+    def test_round_trip(self):
+        contracts = _contracts('INTC', 5)
+        data = thewheel.chaincache.pack_contracts('INTC', contracts)
+        actual = thewheel.chaincache.unpack_contracts(data)
+        self.assertEqual(5, len(actual))
+        for expected, contract in zip(contracts, actual):
+            self.assertEqual(expected.stock, contract.stock)
+            self.assertEqual(expected.expiration, contract.expiration)
+            self.assertAlmostEqual(expected.strike, contract.strike)
+            self.assertAlmostEqual(expected.delta, contract.delta)
+            self.assertAlmostEqual(expected.implied_vol, contract.implied_vol)
+            self.assertAlmostEqual(expected.bid, contract.bid)
+            self.assertAlmostEqual(expected.ask, contract.ask)
+
+    def test_unknown_ask(self):
+        contracts = [PutContract('INTC', date(2022, 5, 13), 40.0, -0.3, 0.5, 1.25)]
+        data = thewheel.chaincache.pack_contracts('INTC', contracts)
+        self.assertIsNone(thewheel.chaincache.unpack_contracts(data)[0].ask)
+
+    def test_empty(self):
+        data = thewheel.chaincache.pack_contracts('SPY', [])
+        self.assertEqual([], thewheel.chaincache.unpack_contracts(data))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            thewheel.chaincache.unpack_contracts(b'not a chain')
+        data = thewheel.chaincache.pack_contracts('SPY', _contracts('SPY', 2))
+        with self.assertRaises(ValueError):
+            thewheel.chaincache.unpack_contracts(data[:-1])
+
+
+class KeyTestCase(unittest.TestCase):
+    """Tests make_key"""
+    def test_key(self):
+        key = thewheel.chaincache.make_key('<html></html>', 'INTC', 1)
+        self.assertEqual(key,
+                         thewheel.chaincache.make_key('<html></html>', 'INTC', 1))
+        self.assertNotEqual(key,
+                            thewheel.chaincache.make_key('<html> </html>', 'INTC', 1))
+        self.assertNotEqual(key,
+                            thewheel.chaincache.make_key('<html></html>', 'SPY', 1))
+        self.assertNotEqual(key,
+                            thewheel.chaincache.make_key('<html></html>', 'INTC', 2))
+
+
+class ChainCacheTestCase(unittest.TestCase):
+    """Tests ChainCache"""
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def test_memory(self):
+        cache = ChainCache()
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', 'INTC', _contracts('INTC', 3))
+        self.assertEqual(3, len(cache.get('a')))
+        self.assertEqual(1, cache.memory_hits)
+        self.assertEqual(0, cache.disk_hits)
+        self.assertEqual(1, cache.misses)
+        self.assertEqual(1, cache.hits)
+
+    def test_memory_budget(self):
+        size = len(thewheel.chaincache.pack_contracts('INTC',
+                                                      _contracts('INTC', 10)))
+        cache = ChainCache(memory_budget=size * 2)
+        cache.put('a', 'INTC', _contracts('INTC', 10))
+        cache.put('b', 'INTC', _contracts('INTC', 10))
+        cache.get('a')  # b is now the least recently used.
+        cache.put('c', 'INTC', _contracts('INTC', 10))
+        self.assertEqual(size * 2, cache.memory_bytes)
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_larger_than_budget(self):
+        cache = ChainCache(memory_budget=10)
+        cache.put('a', 'INTC', _contracts('INTC', 10))
+        self.assertEqual(0, cache.memory_bytes)
+        self.assertIsNone(cache.get('a'))
+
+    def test_disk(self):
+        cache = ChainCache(self.temp_dir.name)
+        cache.put('a', 'INTC', _contracts('INTC', 4))
+
+        # New process.
+        cache = ChainCache(self.temp_dir.name)
+        self.assertEqual(4, len(cache.get('a')))
+        self.assertEqual(1, cache.disk_hits)
+        self.assertEqual(4, len(cache.get('a')))
+        self.assertEqual(1, cache.memory_hits)
+
+    def test_disk_corrupt(self):
+        cache = ChainCache(self.temp_dir.name)
+        path = os.path.join(self.temp_dir.name,
+                            f'a{thewheel.chaincache.FILE_EXTENSION}')
+        with open(path, 'wb') as chain_file:
+            chain_file.write(b'garbage')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(1, cache.misses)
+
+    def test_disk_budget(self):
+        size = len(thewheel.chaincache.pack_contracts('INTC',
+                                                      _contracts('INTC', 10)))
+        cache = ChainCache(self.temp_dir.name, disk_budget=size * 2)
+        for age, key in enumerate(('a', 'b')):
+            cache.put(key, 'INTC', _contracts('INTC', 10))
+            os.utime(cache._path(key), (age, age))
+        cache.put('c', 'INTC', _contracts('INTC', 10))
+
+        self.assertEqual(size * 2, cache.disk_bytes)
+        self.assertFalse(os.path.exists(cache._path('a')))
+        self.assertTrue(os.path.exists(cache._path('b')))
+        self.assertTrue(os.path.exists(cache._path('c')))
+
+    def test_prune_on_open(self):
+        cache = ChainCache(self.temp_dir.name)
+        for key in ('a', 'b', 'c'):
+            cache.put(key, 'INTC', _contracts('INTC', 10))
+        size = len(thewheel.chaincache.pack_contracts('INTC',
+                                                      _contracts('INTC', 10)))
+
+        # New process, with a smaller budget.
+        cache = ChainCache(self.temp_dir.name, disk_budget=size)
+        self.assertEqual(size, cache.disk_bytes)
+        self.assertEqual(1, len(os.listdir(self.temp_dir.name)))
+
+
+class GetPutContractsCacheTestCase(unittest.TestCase):
+    """Tests get_put_contracts with a cache."""
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.intc_html = get_html_contents('put_INTC')
+
+    def test_unchanged_page_is_not_parsed(self):
+        cache = ChainCache()
+        with patch('thewheel.options_api.get_html',
+                   return_value=self.intc_html):
+            expected = thewheel.options_api.get_put_contracts(
+                'INTC', OptionType.PUT, cache=cache)
+            with patch('thewheel.options_api.parse_contracts') as mock_parse:
+                actual = thewheel.options_api.get_put_contracts(
+                    'INTC', OptionType.PUT, cache=cache)
+                mock_parse.assert_not_called()
+
+        self.assertEqual(1, cache.misses)
+        self.assertEqual(1, cache.memory_hits)
+        self.assertEqual(len(expected), len(actual))
+        self.assertEqual(expected[133].expiration, actual[133].expiration)
+        self.assertAlmostEqual(expected[133].strike, actual[133].strike)
+        self.assertAlmostEqual(expected[133].delta, actual[133].delta)
+
+
+if __name__ == '__main__':
+    unittest.main()
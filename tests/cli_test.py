@@ -1,9 +1,15 @@
 """Tests cli.py"""
 import io
+import os
+import tempfile
 import unittest
+from datetime import date
 from unittest.mock import patch
 
 import thewheel.cli
+import thewheel.options_api
+from thewheel.options_api import ChainResult
+from thewheel.putcontract import PutContract
 import thewheel.version
 
 
@@ -16,6 +22,79 @@ class CliTestCase(unittest.TestCase):
         self.assertEqual(f'{thewheel.version.__version__}\n',
                          mock_stdout.getvalue())
 
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_allocate(self, mock_stdout):
+        contracts = [PutContract('INTC', date(2022, 5, 20), 45, -0.3, 0.37, 0.75),
+                     PutContract('INTC', date(2022, 5, 20), 40, -0.1, 0.37, 0.25)]
+        with patch('thewheel.options_api.get_put_contracts',
+                   return_value=ChainResult('INTC', contracts)):
+            result = thewheel.cli.main(['allocate', '-p', '-sINTC',
+                                        '--cash=10000'])
+        self.assertEqual(0, result)
+        self.assertIn('  2x INTC : 2022-05-20 Strike=  45.00', mock_stdout.getvalue())
+        self.assertIn('Premium=150 Cost=9000', mock_stdout.getvalue())
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_allocate_skips_failed_chain(self, mock_stdout):
+        contracts = [PutContract('INTC', date(2022, 5, 20), 45, -0.3, 0.37, 0.75)]
+
+        def get_put_contracts(stock, *_args, **_kwargs):
+            if stock == 'NCLH':
+                raise thewheel.options_api.OptionsAPIException('NCLH is down')
+            return ChainResult(stock, contracts)
+
+        with patch('thewheel.options_api.get_put_contracts',
+                   side_effect=get_put_contracts):
+            result = thewheel.cli.main(['allocate', '-p', '-sNCLH,INTC',
+                                        '--cash=10000'])
+        self.assertEqual(0, result)
+        self.assertIn('Warning: Skipping NCLH: NCLH is down', mock_stdout.getvalue())
+        self.assertIn('  2x INTC : 2022-05-20 Strike=  45.00', mock_stdout.getvalue())
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_partial(self, mock_stdout):
+        contracts = [PutContract('INTC', date(2022, 5, 20), 45, -0.3, 0.37, 0.75)]
+        with patch('thewheel.options_api.get_put_contracts',
+                   return_value=ChainResult('INTC', contracts, False)):
+            result = thewheel.cli.main(['-p', '-sINTC', '--deadline=5'])
+        self.assertEqual(0, result)
+        self.assertIn('INTC is partial: 1 contracts', mock_stdout.getvalue())
+        self.assertIn('Strike=  45.00', mock_stdout.getvalue())
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_adaptive_strikes(self, _mock_stdout):
+        contracts = [PutContract('INTC', date(2022, 5, 20), 44, -0.5, 0.37, 1.25),
+                     PutContract('INTC', date(2022, 5, 20), 45, -0.3, 0.37, 0.75),
+                     PutContract('INTC', date(2022, 5, 20), 46, -0.1, 0.37, 0.25)]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            argv = ['-p', '-sINTC', f'--cache={temp_dir}', '--adaptive-strikes']
+            with patch('thewheel.options_api.get_put_contracts',
+                       return_value=ChainResult('INTC', contracts)) as mock_get:
+                self.assertEqual(0, thewheel.cli.main(argv))
+                self.assertEqual((10, 38), mock_get.call_args[1]['strikes'])
+
+                # The next run remembers the band.
+                self.assertEqual(0, thewheel.cli.main(argv))
+                self.assertEqual((23, 27), mock_get.call_args[1]['strikes'])
+            self.assertTrue(os.path.exists(os.path.join(
+                temp_dir, thewheel.cli.STRIKE_WINDOWS_FILE)))
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_roll(self, mock_stdout):
+        contracts = [PutContract('INTC', date(2022, 5, 20), 45, -0.3, 0.37, 0.75),
+                     PutContract('INTC', date(2022, 5, 27), 44, -0.28, 0.37, 0.95)]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'positions.csv')
+            with open(path, 'w', encoding='utf-8') as positions_file:
+                positions_file.write('symbol,strike,expiration,side,premium\n'
+                                     'INTC,45,2022-05-20,put,0.5\n')
+            with patch('thewheel.options_api.get_calendar_contracts',
+                       return_value=ChainResult('INTC', contracts)):
+                result = thewheel.cli.main(['roll', f'--positions={path}'])
+        self.assertEqual(0, result)
+        self.assertIn('INTC : put  2022-05-20 Strike=  45.00', mock_stdout.getvalue())
+        self.assertIn('-> 2022-05-27 Strike=  44.00 Credit=  20', mock_stdout.getvalue())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -3,6 +3,7 @@ import io
 import unittest
 from unittest.mock import patch
 
+import thewheel.allocator
 import thewheel.config
 import thewheel.version
 import thewheel.options_api
@@ -71,6 +72,31 @@ class ConfigTestCase(unittest.TestCase):
         self.assertAlmostEqual(thewheel.config.DEFAULT_RANGE, test_config.delta_range)
         self.assertEqual(thewheel.options_api.DEFAULT_STRIKE_RANGE,
                          test_config.strike_range)
+        self.assertIsNone(test_config.cache_dir)
+        self.assertFalse(test_config.all_expiries)
+        self.assertIsNone(test_config.deadline)
+
+    def test_deadline(self):
+        test_config = thewheel.config.Config(['--put', '--stock=INTL',
+                                              '--deadline=90'])
+        self.assertAlmostEqual(90.0, test_config.deadline)
+
+    def test_all_expiries(self):
+        test_config = thewheel.config.Config(['--put', '--stock=INTL',
+                                              '--all-expiries'])
+        self.assertTrue(test_config.all_expiries)
+
+    def test_adaptive_strikes(self):
+        test_config = thewheel.config.Config(['--put', '--stock=INTL'])
+        self.assertFalse(test_config.adaptive_strikes)
+        test_config = thewheel.config.Config(['--put', '--stock=INTL',
+                                              '--adaptive-strikes'])
+        self.assertTrue(test_config.adaptive_strikes)
+
+    def test_cache(self):
+        test_config = thewheel.config.Config(['--put', '--stock=INTL',
+                                              '--cache=chains'])
+        self.assertEqual('chains', test_config.cache_dir)
 
     @patch('sys.stdout', new_callable=io.StringIO)
     def test_version(self, mock_stdout):
@@ -104,6 +130,85 @@ class ConfigTestCase(unittest.TestCase):
             thewheel.config.Config(['-c', '-p', '-sINTC', '-d.3'])
         self.assertIn('Cannot specifiy both call and put', mock_stdout.getvalue())
 
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_unknown_option(self, mock_stdout):
+        with self.assertRaises(SystemExit):
+            thewheel.config.Config(['-p', '-sINTC', '--positions=a.csv'])
+        self.assertIn('option --positions not recognized', mock_stdout.getvalue())
+        self.assertIn('python thewheel [options]', mock_stdout.getvalue())
+
+
+class AllocateConfigTestCase(unittest.TestCase):
+    """Tests AllocateConfig"""
+    def test_options(self):
+        test_config = thewheel.config.AllocateConfig(
+            ['-p', '-sINTC,NCLH', '--cash=20000', '--symbol-cap=12000',
+             '--sector=INTC:tech,NCLH:travel', '--sector-cap=15000',
+             '--annualized'])
+        self.assertEqual(['INTC', 'NCLH'], test_config.stocks)
+        self.assertAlmostEqual(20000, test_config.cash)
+        self.assertAlmostEqual(12000, test_config.symbol_cap)
+        self.assertEqual({'INTC': 'tech', 'NCLH': 'travel'}, test_config.sectors)
+        self.assertAlmostEqual(15000, test_config.sector_cap)
+        self.assertEqual(thewheel.allocator.ANNUALIZED, test_config.objective)
+
+    def test_defaults(self):
+        test_config = thewheel.config.AllocateConfig(['-p', '-sINTC', '--cash=5000'])
+        self.assertEqual(['INTC'], test_config.stocks)
+        self.assertIsNone(test_config.symbol_cap)
+        self.assertEqual({}, test_config.sectors)
+        self.assertEqual(thewheel.allocator.PREMIUM, test_config.objective)
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_missing_cash(self, mock_stdout):
+        with self.assertRaises(SystemExit):
+            thewheel.config.AllocateConfig(['-p', '-sINTC'])
+        self.assertIn('Missing required cash', mock_stdout.getvalue())
+        self.assertIn('python thewheel allocate', mock_stdout.getvalue())
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_invalid_sector(self, mock_stdout):
+        for sector in ('INTC', 'INTC:', ':tech'):
+            with self.assertRaises(SystemExit):
+                thewheel.config.AllocateConfig(['-p', '-sINTC', '--cash=5000',
+                                                f'--sector={sector}'])
+        self.assertIn('Invalid sector (--sector): INTC.', mock_stdout.getvalue())
+        self.assertIn('python thewheel allocate', mock_stdout.getvalue())
+
+
+class RollConfigTestCase(unittest.TestCase):
+    """Tests RollConfig"""
+    def test_options(self):
+        test_config = thewheel.config.RollConfig(
+            ['--positions=positions.csv', '--top=5', '--min-credit=.1',
+             '--max-delta=.4', '--deadline=60'])
+        self.assertEqual('positions.csv', test_config.positions_file)
+        self.assertEqual(5, test_config.top)
+        self.assertAlmostEqual(.1, test_config.min_credit)
+        self.assertAlmostEqual(.4, test_config.max_delta)
+        self.assertAlmostEqual(60, test_config.deadline)
+        self.assertIsNone(test_config.stock)
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_missing_positions(self, mock_stdout):
+        with self.assertRaises(SystemExit):
+            thewheel.config.RollConfig(['--top=5'])
+        self.assertIn('Missing required positions', mock_stdout.getvalue())
+        self.assertIn('python thewheel roll', mock_stdout.getvalue())
+        self.assertIn('--deadline=', mock_stdout.getvalue())
+        self.assertNotIn('As above', mock_stdout.getvalue())
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_unused_options(self, mock_stdout):
+        for option in ('-sINTC', '-d.3', '-r.03', '-p', '-c',
+                       '--all-expiries', '--adaptive-strikes'):
+            mock_stdout.truncate(0)
+            with self.assertRaises(SystemExit):
+                thewheel.config.RollConfig(['--positions=positions.csv',
+                                            option])
+            self.assertIn('not recognized', mock_stdout.getvalue())
+            self.assertIn('python thewheel roll', mock_stdout.getvalue())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,30 @@
+"""Tests deadline.py"""
+import unittest
+
+import thewheel.deadline
+from thewheel.deadline import Deadline
+
+
+class DeadlineTestCase(unittest.TestCase):
+    """Tests Deadline"""
+    def setUp(self):
+        self.now = 100.0
+        self.deadline = Deadline(10, clock=lambda: self.now)
+
+    def test_remaining(self):
+        self.assertAlmostEqual(10.0, self.deadline.remaining())
+        self.assertFalse(self.deadline.expired)
+        self.now = 109.0
+        self.assertAlmostEqual(1.0, self.deadline.remaining())
+        self.now = 111.0
+        self.assertAlmostEqual(0.0, self.deadline.remaining())
+        self.assertTrue(self.deadline.expired)
+
+    def test_remaining_function(self):
+        self.assertIsNone(thewheel.deadline.remaining(None))
+        self.assertEqual(5, thewheel.deadline.remaining(None, 5))
+        self.assertAlmostEqual(10.0, thewheel.deadline.remaining(self.deadline))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+"""Tests fetcher.py"""
+import itertools
+import time
+import unittest
+from unittest.mock import patch
+
+import requests
+import responses
+
+from thewheel.deadline import Deadline
+from thewheel.fetcher import (CircuitBreaker, DeadlineExceededError, FetchError,
+                              Fetcher, LatencyTracker)
+
+URL = 'https://example.com/chain'
+
+
+class LatencyTrackerTestCase(unittest.TestCase):
+    """Tests LatencyTracker"""
+    def test_percentile(self):
+        tracker = LatencyTracker()
+        self.assertIsNone(tracker.percentile(95))
+        for index in range(100):
+            tracker.add(index / 100)
+        self.assertAlmostEqual(.95, tracker.percentile(95))
+        self.assertIsNone(tracker.percentile(95, min_samples=101))
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    """Tests CircuitBreaker"""
+    def setUp(self):
+        self.now = 0.0
+        self.circuit = CircuitBreaker(failure_threshold=2, reset_timeout=10,
+                                      clock=lambda: self.now)
+
+    def test_opens_and_resets(self):
+        self.circuit.record_failure()
+        self.assertTrue(self.circuit.allow())
+        self.circuit.record_failure()
+        self.assertTrue(self.circuit.is_open)
+        self.assertFalse(self.circuit.allow())
+
+        # Half open lets one through.
+        self.now = 10.0
+        self.assertTrue(self.circuit.allow())
+        self.assertFalse(self.circuit.allow())
+        self.circuit.record_success()
+        self.assertFalse(self.circuit.is_open)
+        self.assertTrue(self.circuit.allow())
+
+    def test_half_open_failure(self):
+        self.circuit.record_failure()
+        self.circuit.record_failure()
+        self.now = 10.0
+        self.assertTrue(self.circuit.allow())
+        self.circuit.record_failure()
+        self.now = 15.0
+        self.assertFalse(self.circuit.allow())
+
+
+class FetcherTestCase(unittest.TestCase):
+    """Tests Fetcher"""
+    def setUp(self):
+        self.fetcher = Fetcher(timeout=1, retries=2, backoff=0)
+
+    @responses.activate
+    def test_success(self):
+        responses.add(responses.POST, URL, body='ok')
+        response = self.fetcher.post(URL, data={'a': '1'})
+        self.assertEqual('ok', response.text)
+        self.assertEqual(1, len(responses.calls))
+
+    @responses.activate
+    def test_retries_server_error(self):
+        responses.add(responses.POST, URL, status=503)
+        responses.add(responses.POST, URL,
+                      body=requests.exceptions.ConnectTimeout('slow'))
+        responses.add(responses.POST, URL, body='ok')
+        self.assertEqual('ok', self.fetcher.post(URL).text)
+        self.assertEqual(3, len(responses.calls))
+
+    @responses.activate
+    def test_gives_up(self):
+        responses.add(responses.POST, URL, status=500)
+        with self.assertRaises(FetchError) as context:
+            self.fetcher.post(URL)
+        self.assertEqual(3, len(responses.calls))
+        self.assertEqual(500, context.exception.status_code)
+        self.assertIn('3 attempt(s)', str(context.exception))
+
+    @responses.activate
+    def test_client_error_not_retried(self):
+        responses.add(responses.POST, URL, status=404)
+        with self.assertRaises(FetchError) as context:
+            self.fetcher.post(URL)
+        self.assertEqual(1, len(responses.calls))
+        self.assertFalse(context.exception.retryable)
+        self.assertFalse(self.fetcher.circuit('example.com').is_open)
+
+    @responses.activate
+    def test_circuit_opens(self):
+        fetcher = Fetcher(retries=1, backoff=0, failure_threshold=2)
+        responses.add(responses.POST, URL, status=502)
+        with self.assertRaises(FetchError):
+            fetcher.post(URL)
+        self.assertTrue(fetcher.circuit('example.com').is_open)
+
+        with self.assertRaises(FetchError) as context:
+            fetcher.post(URL)
+        self.assertIn('Circuit open', str(context.exception))
+        self.assertEqual(2, len(responses.calls))
+
+    @responses.activate
+    def test_retried_successes_close_circuit(self):
+        fetcher = Fetcher(retries=1, backoff=0, failure_threshold=3)
+        for _ in range(5):
+            responses.add(responses.POST, URL, status=503)
+            responses.add(responses.POST, URL, body='ok')
+        for _ in range(5):
+            self.assertEqual('ok', fetcher.post(URL).text)
+        self.assertEqual(0, fetcher.circuit('example.com').failures)
+        self.assertEqual(10, len(responses.calls))
+
+    @responses.activate
+    def test_half_open_success(self):
+        fetcher = Fetcher(retries=0, failure_threshold=1, reset_timeout=.05)
+        responses.add(responses.POST, URL, status=502)
+        responses.add(responses.POST, URL, body='ok')
+        with self.assertRaises(FetchError):
+            fetcher.post(URL)
+        self.assertTrue(fetcher.circuit('example.com').is_open)
+
+        time.sleep(.06)
+        self.assertEqual('ok', fetcher.post(URL).text)
+        self.assertFalse(fetcher.circuit('example.com').is_open)
+        self.assertEqual('ok', fetcher.post(URL).text)
+
+    @responses.activate
+    def test_on_attempt(self):
+        responses.add(responses.POST, URL, status=503)
+        responses.add(responses.POST, URL,
+                      body=requests.exceptions.ConnectTimeout('slow'))
+        responses.add(responses.POST, URL, body='ok')
+        attempts = []
+        self.fetcher.post(URL, on_attempt=lambda status, seconds:
+                          attempts.append(status))
+        self.assertEqual([503, None, 200], attempts)
+
+    @responses.activate
+    def test_hedge(self):
+        fetcher = Fetcher(retries=0, hedge=True)
+        for _ in range(50):
+            fetcher.latencies.add(.01)
+        bodies = ['slow', 'fast']
+        sent = []
+
+        def callback(_):
+            body = bodies[len(sent)]
+            sent.append(body)
+            if body == 'slow':
+                time.sleep(.5)
+            return 200, {}, body
+
+        responses.add_callback(responses.POST, URL, callback=callback)
+        start = time.perf_counter()
+        response = fetcher.post(URL)
+        self.assertEqual('fast', response.text)
+        self.assertLess(time.perf_counter() - start, .5)
+        self.assertEqual(['slow', 'fast'], sent)
+
+    @responses.activate
+    def test_no_hedge_without_samples(self):
+        fetcher = Fetcher(retries=0, hedge=True)
+        responses.add(responses.POST, URL, body='ok')
+        self.assertEqual('ok', fetcher.post(URL).text)
+        self.assertEqual(1, len(responses.calls))
+
+    @responses.activate
+    def test_deadline_expired(self):
+        responses.add(responses.POST, URL, body='ok')
+        with self.assertRaises(DeadlineExceededError):
+            self.fetcher.post(URL, Deadline(0))
+        self.assertEqual(0, len(responses.calls))
+
+    def test_deadline_read_once(self):
+        # Expires between checks.  The timeout must come from the same read
+        # as the check, or it would be 0, which requests rejects.
+        clock = itertools.chain([0, 4], itertools.repeat(6))
+        deadline = Deadline(5, clock=lambda: next(clock))
+        with patch('requests.post') as mock_post:
+            mock_post.return_value.ok = True
+            self.fetcher.post(URL, deadline)
+        self.assertEqual(1, mock_post.call_args[1]['timeout'])
+
+    @responses.activate
+    def test_deadline_stops_retries(self):
+        fetcher = Fetcher(retries=5, backoff=10, max_backoff=10)
+        responses.add(responses.POST, URL, status=503)
+        start = time.perf_counter()
+        with self.assertRaises(DeadlineExceededError):
+            fetcher.post(URL, Deadline(.2))
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertFalse(fetcher.circuit('example.com').is_open)
+
+    def test_backoff(self):
+        fetcher = Fetcher(backoff=1, max_backoff=3)
+        with patch('random.uniform', side_effect=lambda low, high: high):
+            self.assertEqual(1, fetcher._backoff_delay(1))
+            self.assertEqual(2, fetcher._backoff_delay(2))
+            self.assertEqual(3, fetcher._backoff_delay(5))
+
+
+if __name__ == '__main__':
+    unittest.main()
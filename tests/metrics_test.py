@@ -0,0 +1,199 @@
+"""Tests metrics.py"""
+import json
+import unittest
+import urllib.request
+from unittest.mock import patch
+
+import requests
+import responses
+
+from tests import get_html_contents
+import thewheel.metrics
+import thewheel.options_api
+from thewheel.config import OptionType
+from thewheel.fetcher import Fetcher
+from thewheel.metrics import Registry
+
+
+class RegistryTestCase(unittest.TestCase):
+    """Tests Registry"""
+    def setUp(self):
+        self.registry = Registry(enabled=True)
+        self.counter = self.registry.counter('test_total', 'Test counter.')
+        self.histogram = self.registry.histogram('test_seconds',
+                                                 'Test histogram.', (1, 5))
+
+    def test_disabled(self):
+        self.registry.enabled = False
+        self.counter.inc(symbol='INTC')
+        self.histogram.observe(2, symbol='INTC')
+        self.assertIsNone(self.counter.get(symbol='INTC'))
+        self.assertIsNone(self.histogram.get(symbol='INTC'))
+
+    def test_counter(self):
+        self.counter.inc(symbol='INTC')
+        self.counter.inc(3, symbol='INTC')
+        self.counter.inc(symbol='SPY')
+        self.assertEqual(4, self.counter.get(symbol='INTC'))
+        self.assertEqual(1, self.counter.get(symbol='SPY'))
+
+    def test_declare_twice(self):
+        self.assertIs(self.counter,
+                      self.registry.counter('test_total', 'Again.'))
+        with self.assertRaises(ValueError):
+            self.registry.gauge('test_total', 'Wrong kind.')
+
+    def test_prometheus(self):
+        self.counter.inc(symbol='INTC')
+        self.histogram.observe(.5, symbol='INTC')
+        self.histogram.observe(3, symbol='INTC')
+        self.histogram.observe(10, symbol='INTC')
+        text = self.registry.to_prometheus()
+        self.assertIn('# TYPE test_total counter\n', text)
+        self.assertIn('test_total{symbol="INTC"} 1\n', text)
+        self.assertIn('test_seconds_bucket{symbol="INTC",le="1"} 1\n', text)
+        self.assertIn('test_seconds_bucket{symbol="INTC",le="5"} 2\n', text)
+        self.assertIn('test_seconds_bucket{symbol="INTC",le="+Inf"} 3\n', text)
+        self.assertIn('test_seconds_sum{symbol="INTC"} 13.5\n', text)
+        self.assertIn('test_seconds_count{symbol="INTC"} 3\n', text)
+
+    def test_json(self):
+        self.counter.inc(symbol='INTC')
+        self.histogram.observe(3, symbol='INTC')
+        result = json.loads(self.registry.to_json())
+        self.assertEqual([{'labels': {'symbol': 'INTC'}, 'value': 1}],
+                         result['test_total']['samples'])
+        sample = result['test_seconds']['samples'][0]
+        self.assertEqual({'1': 0, '5': 1}, sample['buckets'])
+        self.assertEqual(1, sample['count'])
+
+    def test_reset(self):
+        self.counter.inc(symbol='INTC')
+        self.registry.reset()
+        self.assertIsNone(self.counter.get(symbol='INTC'))
+
+    def test_serve(self):
+        self.counter.inc(symbol='INTC')
+        server = self.registry.serve(0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        port = server.server_address[1]
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics') \
+                as response:
+            self.assertIn('test_total{symbol="INTC"} 1',
+                          response.read().decode('utf-8'))
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics.json') \
+                as response:
+            self.assertIn('test_total', json.loads(response.read()))
+
+
+class OptionsAPIMetricsTestCase(unittest.TestCase):
+    """Tests the metrics recorded by options_api."""
+    def setUp(self):
+        thewheel.metrics.REGISTRY.reset()
+        thewheel.metrics.REGISTRY.enabled = True
+        self.addCleanup(setattr, thewheel.metrics.REGISTRY, 'enabled', False)
+        self.addCleanup(thewheel.metrics.REGISTRY.reset)
+
+    @responses.activate
+    def test_get_html(self):
+        stock = 'INTC'
+        url = f'{thewheel.options_api.BASE_URL}/{stock}'
+        responses.add(responses.POST, url, body='<html></html>')
+
+        thewheel.options_api.get_html(stock, OptionType.PUT, 12)
+
+        self.assertEqual(1, thewheel.options_api.HTTP_RESPONSES.get(
+            symbol=stock, status='200'))
+        self.assertEqual(1, thewheel.options_api.HTML_SECONDS.get(
+            symbol=stock)[0])
+        self.assertEqual((1, 13), thewheel.options_api.HTML_BYTES.get(
+            symbol=stock))
+
+    @responses.activate
+    def test_get_html_retried(self):
+        stock = 'INTC'
+        url = f'{thewheel.options_api.BASE_URL}/{stock}'
+        responses.add(responses.POST, url, status=503)
+        responses.add(responses.POST, url, body='<html></html>')
+
+        with patch('thewheel.options_api.FETCHER', Fetcher(backoff=0)):
+            thewheel.options_api.get_html(stock, OptionType.PUT, 12)
+
+        self.assertEqual(1, thewheel.options_api.HTTP_RESPONSES.get(
+            symbol=stock, status='503'))
+        self.assertEqual(1, thewheel.options_api.HTTP_RESPONSES.get(
+            symbol=stock, status='200'))
+        self.assertEqual(1, thewheel.options_api.HTML_SECONDS.get(
+            symbol=stock)[0])
+
+    @responses.activate
+    def test_get_html_failed(self):
+        stock = 'INTC'
+        url = f'{thewheel.options_api.BASE_URL}/{stock}'
+        responses.add(responses.POST, url,
+                      body=requests.exceptions.ReadTimeout('slow'))
+
+        with patch('thewheel.options_api.FETCHER', Fetcher(retries=0)):
+            with self.assertRaises(thewheel.options_api.OptionsAPIException):
+                thewheel.options_api.get_html(stock, OptionType.PUT, 12)
+
+        self.assertEqual(1, thewheel.options_api.HTTP_RESPONSES.get(
+            symbol=stock, status='none'))
+        self.assertEqual(1, thewheel.options_api.HTML_SECONDS.get(
+            symbol=stock)[0])
+
+    def test_parse(self):
+        stock = 'INTC'
+        html_contents = get_html_contents('put_INTC')
+
+        with patch('thewheel.options_api.get_html',
+                   return_value=html_contents):
+            contracts = thewheel.options_api.get_put_contracts(stock,
+                                                               OptionType.PUT)
+
+        self.assertEqual(len(contracts),
+                         thewheel.options_api.CONTRACTS.get(symbol=stock))
+        self.assertEqual(1, thewheel.options_api.PARSE_SECONDS.get(
+            symbol=stock)[0])
+        self.assertLess(len(contracts),
+                        thewheel.options_api.PARSE_ROWS.get(symbol=stock))
+        self.assertGreater(thewheel.options_api.PARSE_ROWS_PER_SECOND.get(
+            symbol=stock), 0)
+
+    def test_errors(self):
+        stock = 'INTC'
+        with patch('thewheel.options_api.get_html',
+                   side_effect=thewheel.options_api.OptionsAPIException('x')):
+            with self.assertRaises(thewheel.options_api.OptionsAPIException):
+                thewheel.options_api.get_put_contracts(stock, OptionType.PUT)
+        self.assertEqual(1, thewheel.options_api.ERRORS.get(symbol=stock))
+
+    def test_calendar_past_last_expiry(self):
+        stock = 'NCLH'
+        html_contents = get_html_contents('put_NCLH')
+
+        def get_html(_stock, _option_type, _strike_range, _strikes, expiries,
+                     _deadline):
+            # NCLH lists 6 months, so (6, 8) is past the end.
+            return '<html></html>' if expiries == (6, 8) else html_contents
+
+        with patch('thewheel.options_api.get_html', side_effect=get_html):
+            contracts = thewheel.options_api.get_calendar_contracts(
+                stock, OptionType.PUT)
+        self.assertIsNone(thewheel.options_api.ERRORS.get(symbol=stock))
+        self.assertEqual(len(contracts),
+                         thewheel.options_api.CONTRACTS.get(symbol=stock))
+
+    def test_calendar_errors(self):
+        stock = 'INTC'
+        with patch('thewheel.options_api.get_html',
+                   side_effect=thewheel.options_api.OptionsAPIException('x')):
+            with self.assertRaises(thewheel.options_api.OptionsAPIException):
+                thewheel.options_api.get_calendar_contracts(stock,
+                                                            OptionType.PUT)
+        self.assertEqual(1, thewheel.options_api.ERRORS.get(symbol=stock))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,5 @@
 """Tests Options API"""
-import os
+import time
 import unittest
 from unittest.mock import patch
 from urllib import parse
@@ -7,7 +7,11 @@ from datetime import date
 
 import responses
 
+from tests import get_html_contents
+import thewheel.chaincache
+import thewheel.fetcher
 import thewheel.options_api
+from thewheel.deadline import Deadline
 from thewheel.putcontract import PutContract
 from thewheel.config import OptionType
 
@@ -16,10 +20,7 @@ class OptionsAPITestCase(unittest.TestCase):
     """Contains common methods for testing puts and calls."""
     @staticmethod
     def _get_html_contents(basefilename):
-        path = os.path.join(os.path.dirname(__file__), 'html', f'{basefilename}.html')
-        with open(path, encoding='utf-8') as html_file:
-            html_contents = html_file.read()
-        return html_contents
+        return get_html_contents(basefilename)
 
     def _check_contract(self, expected: PutContract, actual: PutContract):
         self.assertEqual(expected.expiration, actual.expiration)
@@ -28,6 +29,8 @@ class OptionsAPITestCase(unittest.TestCase):
         self.assertAlmostEqual(expected.delta, actual.delta)
         self.assertAlmostEqual(expected.implied_vol, actual.implied_vol)
         self.assertAlmostEqual(expected.bid, actual.bid)
+        if expected.ask is not None:
+            self.assertAlmostEqual(expected.ask, actual.ask)
 
 
 class PutOptionsAPITestCase(OptionsAPITestCase):
@@ -67,6 +70,36 @@ class PutOptionsAPITestCase(OptionsAPITestCase):
         self.assertEqual(stock, post_params['prevns'])
         self.assertEqual('12', post_params['mn1min'])
         self.assertEqual('36', post_params['mn1max'])
+        self.assertEqual('0', post_params['expmin'])
+        self.assertEqual('2', post_params['expmax'])
+
+    @responses.activate
+    def test_post_html_expiries(self):
+        """Verify the expiry window."""
+        stock = 'INTC'
+        url = f'{thewheel.options_api.BASE_URL}/{stock}'
+        responses.add(responses.POST, url,
+                      body='<html></html>')
+
+        thewheel.options_api.get_html(stock, OptionType.PUT, 12, None, (4, 6))
+
+        post_params = dict(parse.parse_qsl(responses.calls[0].request.body))
+        self.assertEqual('4', post_params['expmin'])
+        self.assertEqual('6', post_params['expmax'])
+
+    @responses.activate
+    def test_post_html_strikes(self):
+        """Verify strikes overrides the strike range."""
+        stock = 'INTC'
+        url = f'{thewheel.options_api.BASE_URL}/{stock}'
+        responses.add(responses.POST, url,
+                      body='<html></html>')
+
+        thewheel.options_api.get_html(stock, OptionType.PUT, 12, (17, 25))
+
+        post_params = dict(parse.parse_qsl(responses.calls[0].request.body))
+        self.assertEqual('17', post_params['mn1min'])
+        self.assertEqual('25', post_params['mn1max'])
 
     def test_intc(self):
         stock = 'INTC'
@@ -82,7 +115,8 @@ class PutOptionsAPITestCase(OptionsAPITestCase):
         self._check_contract(expected1, contract1)
 
         contract2 = contracts[40]
-        expected2 = PutContract(stock, date(2022, 5, 20), 40.0, -0.1845, 0.503, 0.39)
+        expected2 = PutContract(stock, date(2022, 5, 20), 40.0, -0.1845, 0.503, 0.39,
+                                0.40)
         self._check_contract(expected2, contract2)
 
         contract3 = contracts[133]
@@ -131,6 +165,28 @@ class PutOptionsAPITestCase(OptionsAPITestCase):
         expected3 = PutContract(stock, date(2022, 6, 13), 405.0, -0.5625, 0.2718, 17.03)
         self._check_contract(expected3, contract3)
 
+    @responses.activate
+    def test_get_html_error(self):
+        """Verify a failed request raises instead of returning nothing."""
+        stock = 'INTC'
+        url = f'{thewheel.options_api.BASE_URL}/{stock}'
+        responses.add(responses.POST, url, status=500)
+
+        with patch('thewheel.options_api.FETCHER',
+                   thewheel.fetcher.Fetcher(retries=1, backoff=0)):
+            with self.assertRaises(thewheel.options_api.OptionsAPIException) \
+                    as context:
+                thewheel.options_api.get_html(stock, OptionType.PUT, 12)
+        self.assertIn('HTTP 500', str(context.exception))
+        self.assertEqual(2, len(responses.calls))
+
+    def test_missing_table(self):
+        """Tests a page without an option chain."""
+        with patch('thewheel.options_api.get_html',
+                   return_value='<html></html>'):
+            with self.assertRaises(thewheel.options_api.OptionsAPIException):
+                thewheel.options_api.get_put_contracts('INTC', OptionType.PUT)
+
     def test_invalid_header_row(self):
         """Tests the header row columns aren't as excepted."""
         stock = 'INTC'
@@ -194,6 +250,179 @@ class CallOptionsAPITestCase(OptionsAPITestCase):
         self._check_contract(expected3, contract3)
 
 
+class CalendarTestCase(OptionsAPITestCase):
+    """Tests fetching every expiry."""
+    def test_expiry_windows(self):
+        self.assertEqual([(0, 1), (2, 3), (4, 5)],
+                         thewheel.options_api.get_expiry_windows(2, 5))
+        self.assertEqual([(0, 2), (3, 5), (6, 6)],
+                         thewheel.options_api.get_expiry_windows(3, 6))
+        self.assertEqual([(0, 0)], thewheel.options_api.get_expiry_windows(3, 0))
+
+    def test_parse_expiry_months(self):
+        months = thewheel.options_api.parse_expiry_months(
+            self._get_html_contents('put_NCLH'))
+        self.assertEqual(['May 22', 'Jun 22', 'Sep 22', 'Dec 22', 'Jan 23',
+                          'Jan 24'], months)
+        self.assertEqual([], thewheel.options_api.parse_expiry_months(
+            '<html></html>'))
+
+    def test_merge_expiries(self):
+        first = [PutContract('INTC', date(2022, 5, 20), 40, -0.3, 0.4, 1),
+                 PutContract('INTC', date(2022, 5, 20), 41, -0.4, 0.4, 1)]
+        second = [PutContract('INTC', date(2022, 5, 20), 40, -0.3, 0.4, 1),
+                  PutContract('INTC', date(2022, 5, 20), 41, -0.4, 0.4, 1),
+                  PutContract('INTC', date(2022, 6, 17), 40, -0.3, 0.4, 1)]
+        early = [PutContract('INTC', date(2022, 5, 13), 40, -0.3, 0.4, 1)]
+        merged = thewheel.options_api.merge_expiries([second, first, early])
+        self.assertEqual([date(2022, 5, 13), date(2022, 5, 20),
+                          date(2022, 5, 20), date(2022, 6, 17)],
+                         [contract.expiration for contract in merged])
+
+    def _get_calendar(self, pages, default='<html></html>'):
+        """Returns the calendar and the windows requested."""
+        requested = []
+
+        def get_html(_stock, _option_type, _strike_range, _strikes, expiries,
+                     _deadline):
+            requested.append(expiries)
+            return pages.get(expiries, default)
+
+        with patch('thewheel.options_api.get_html', side_effect=get_html):
+            contracts = thewheel.options_api.get_calendar_contracts(
+                'INTC', OptionType.PUT)
+        return contracts, sorted(requested)
+
+    def test_calendar(self):
+        # INTC lists 9 months: 0 to 8.
+        pages = {(0, 2): self._get_html_contents('put_INTC'),
+                 (3, 5): self._get_html_contents('put_NCLH'),
+                 (6, 8): self._get_html_contents('put_SPY')}
+        contracts, requested = self._get_calendar(pages)
+
+        self.assertEqual([(0, 2), (3, 5), (6, 8)], requested)
+        self.assertTrue(contracts.complete)
+        expected = thewheel.options_api.merge_expiries(
+            [thewheel.options_api.parse_contracts(pages[expiries], 'INTC')
+             for expiries in requested])
+        self.assertEqual(len(expected), len(contracts))
+        for expected_contract, contract in zip(expected, contracts):
+            self._check_contract(expected_contract, contract)
+
+    def test_longer_than_guess(self):
+        # SPY lists 13 months: 0 to 12.
+        spy_html = self._get_html_contents('put_SPY')
+        contracts, requested = self._get_calendar({}, spy_html)
+        self.assertEqual([(0, 2), (3, 5), (6, 8), (9, 11), (12, 12)], requested)
+        self.assertTrue(contracts.complete)
+
+    def test_shorter_than_guess(self):
+        # NCLH lists 6 months, so (6, 8) has no chain and is dropped.
+        nclh_html = self._get_html_contents('put_NCLH')
+        contracts, _ = self._get_calendar({(0, 2): nclh_html,
+                                           (3, 5): nclh_html})
+        self.assertTrue(contracts.complete)
+        self.assertEqual(len(thewheel.options_api.parse_contracts(
+            nclh_html, 'INTC')), len(contracts))
+
+    def test_no_chain(self):
+        with self.assertRaises(thewheel.options_api.ChainNotFoundException):
+            self._get_calendar({})
+
+    def test_missing_window(self):
+        intc_html = self._get_html_contents('put_INTC')
+        with self.assertRaises(thewheel.options_api.ChainNotFoundException):
+            self._get_calendar({(0, 2): intc_html, (6, 8): intc_html})
+
+    def test_no_month_list(self):
+        intc_html = self._get_html_contents('put_INTC').replace('exp_values',
+                                                                'values')
+        # Ends before the guess.
+        contracts, _ = self._get_calendar({(0, 2): intc_html})
+        self.assertTrue(contracts.complete)
+        self.assertTrue(contracts)
+        # May go on past the guess.
+        contracts, _ = self._get_calendar({}, intc_html)
+        self.assertFalse(contracts.complete)
+
+
+class DeadlineTestCase(OptionsAPITestCase):
+    """Tests retrieval with a deadline."""
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.intc_html = cls._get_html_contents('put_INTC')
+
+    def test_complete(self):
+        with patch('thewheel.options_api.get_html',
+                   return_value=self.intc_html):
+            contracts = thewheel.options_api.get_put_contracts(
+                'INTC', OptionType.PUT, deadline=Deadline(60))
+        self.assertTrue(contracts.complete)
+        self.assertEqual('INTC', contracts.stock)
+        self.assertEqual(len(thewheel.options_api.parse_contracts(
+            self.intc_html, 'INTC')), len(contracts))
+
+    def test_parse_stops_at_expiry(self):
+        # Expires once the first contract has been parsed.
+        deadline = Deadline(60)
+        build_contract = thewheel.options_api._build_contract_from_row
+
+        def build_and_expire(*args):
+            build_contract(*args)
+            deadline.expires_at = 0
+
+        with patch('thewheel.options_api.get_html',
+                   return_value=self.intc_html), \
+                patch('thewheel.options_api._build_contract_from_row',
+                      side_effect=build_and_expire):
+            contracts = thewheel.options_api.get_put_contracts(
+                'INTC', OptionType.PUT, deadline=deadline)
+        self.assertFalse(contracts.complete)
+        # The whole first expiry, nothing after it.
+        self.assertEqual(34, len(contracts))
+        self.assertEqual({date(2022, 5, 13)},
+                         {contract.expiration for contract in contracts})
+
+    def test_partial_not_cached(self):
+        cache = thewheel.chaincache.ChainCache()
+        with patch('thewheel.options_api.get_html',
+                   return_value=self.intc_html):
+            contracts = thewheel.options_api.get_put_contracts(
+                'INTC', OptionType.PUT, cache=cache, deadline=Deadline(0))
+        self.assertFalse(contracts.complete)
+        self.assertEqual(0, cache.memory_bytes)
+
+    @responses.activate
+    def test_fetch_out_of_time(self):
+        stock = 'INTC'
+        url = f'{thewheel.options_api.BASE_URL}/{stock}'
+        responses.add(responses.POST, url, body=self.intc_html)
+        contracts = thewheel.options_api.get_put_contracts(
+            stock, OptionType.PUT, deadline=Deadline(0))
+        self.assertFalse(contracts.complete)
+        self.assertEqual([], contracts)
+        self.assertEqual(0, len(responses.calls))
+
+    def test_calendar(self):
+        nclh_html = self._get_html_contents('put_NCLH')
+
+        def get_html(_stock, _option_type, _strike_range, _strikes, expiries,
+                     _deadline):
+            if expiries == (0, 2):
+                return self.intc_html
+            time.sleep(1)
+            return nclh_html
+
+        start = time.perf_counter()
+        with patch('thewheel.options_api.get_html', side_effect=get_html):
+            contracts = thewheel.options_api.get_calendar_contracts(
+                'INTC', OptionType.PUT, deadline=Deadline(.5))
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertFalse(contracts.complete)
+        self.assertEqual(len(thewheel.options_api.parse_contracts(
+            self.intc_html, 'INTC')), len(contracts))
+
+
 class StrikeRangeTestCase(unittest.TestCase):
     """Tests check_strike_range."""
     def test_min(self):
@@ -25,6 +25,13 @@ class PutContractTestCase(unittest.TestCase):
     def test_premium(self):
         self.assertAlmostEqual(75.0, self.contract.premium)
 
+    def test_buy_price(self):
+        self.assertIsNone(self.contract.ask)
+        self.assertAlmostEqual(0.75, self.contract.buy_price)
+        contract = PutContract('INTL', date(2022, 5, 20), 45, -0.3186, 0.3713, 0.75, 0.8)
+        self.assertAlmostEqual(0.8, contract.ask)
+        self.assertAlmostEqual(0.8, contract.buy_price)
+
     def test_cost(self):
         self.assertAlmostEqual(4500.0, self.contract.cost)
 
@@ -0,0 +1,182 @@
+"""Tests roll.py"""
+import os
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import thewheel.options_api
+import thewheel.roll
+from thewheel.config import OptionType
+from thewheel.options_api import ChainResult
+from thewheel.putcontract import PutContract
+from thewheel.roll import ChainIndex, Position
+
+
+def _chain(stock, deltas_sign):
+    """Three expiries, strikes 40 to 46.  Later expiries pay more."""
+    contracts = []
+    for week, expiration in enumerate((date(2022, 5, 20), date(2022, 5, 27),
+                                       date(2022, 6, 3))):
+        for strike in range(40, 47):
+            distance = abs(strike - 43)
+            contracts.append(PutContract(stock, expiration, float(strike),
+                                         deltas_sign * (0.5 - distance * 0.07),
+                                         0.4, 0.2 + week * 0.3 + (3 - distance) * 0.1))
+    return contracts
+
+
+class PositionTestCase(unittest.TestCase):
+    """Tests reading positions."""
+    def test_read_positions(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'positions.csv')
+            with open(path, 'w', encoding='utf-8') as positions_file:
+                positions_file.write('symbol,strike,expiration,side,premium\n'
+                                     'intc,45,2022-05-20,put,0.75\n'
+                                     'SPY,420.5,2022-06-17,call,3.1\n')
+            positions = thewheel.roll.read_positions(path)
+        self.assertEqual(2, len(positions))
+        self.assertEqual('INTC', positions[0].stock)
+        self.assertAlmostEqual(45.0, positions[0].strike)
+        self.assertEqual(date(2022, 5, 20), positions[0].expiration)
+        self.assertIs(OptionType.PUT, positions[0].option_type)
+        self.assertAlmostEqual(0.75, positions[0].premium)
+        self.assertIs(OptionType.CALL, positions[1].option_type)
+        self.assertEqual('INTC : put  2022-05-20 Strike=  45.00 Premium=  75',
+                         str(positions[0]))
+
+    def test_invalid(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'positions.csv')
+            with open(path, 'w', encoding='utf-8') as positions_file:
+                positions_file.write('symbol,strike,expiration,side,premium\n'
+                                     'INTC,45,2022-05-20,straddle,0.75\n')
+            with self.assertRaises(ValueError) as context:
+                thewheel.roll.read_positions(path)
+        self.assertIn('line 2', str(context.exception))
+
+
+class ChainIndexTestCase(unittest.TestCase):
+    """Tests ChainIndex"""
+    def setUp(self):
+        self.index = ChainIndex(_chain('INTC', -1))
+
+    def test_find(self):
+        contract = self.index.find(date(2022, 5, 27), 44.0)
+        self.assertEqual(date(2022, 5, 27), contract.expiration)
+        self.assertAlmostEqual(44.0, contract.strike)
+        self.assertIsNone(self.index.find(date(2022, 5, 27), 44.5))
+        self.assertIsNone(self.index.find(date(2022, 5, 13), 44.0))
+
+    def test_later_put(self):
+        later = list(self.index.later(date(2022, 5, 20), 42.0, OptionType.PUT))
+        self.assertEqual(6, len(later))
+        for contract in later:
+            self.assertGreater(contract.expiration, date(2022, 5, 20))
+            self.assertLessEqual(contract.strike, 42.0)
+
+    def test_later_call(self):
+        later = list(self.index.later(date(2022, 5, 27), 45.0, OptionType.CALL))
+        self.assertEqual([(date(2022, 6, 3), 45.0), (date(2022, 6, 3), 46.0)],
+                         [(contract.expiration, contract.strike)
+                          for contract in later])
+
+
+class FindRollsTestCase(unittest.TestCase):
+    """Tests find_rolls"""
+    def test_put(self):
+        position = Position('INTC', 43.0, date(2022, 5, 20), OptionType.PUT, 0.5)
+        rolls = thewheel.roll.find_rolls([position],
+                                         ChainIndex(_chain('INTC', -1)), top=2)[0]
+        self.assertIsNone(rolls.error)
+        self.assertEqual(2, len(rolls.candidates))
+        best = rolls.candidates[0]
+        self.assertEqual(date(2022, 6, 3), best.target.expiration)
+        self.assertAlmostEqual(43.0, best.target.strike)
+        self.assertAlmostEqual(0.6, best.net_credit)
+        self.assertAlmostEqual(110.0, best.total_credit)
+        self.assertGreaterEqual(best.net_credit, rolls.candidates[1].net_credit)
+        self.assertIn('-> 2022-06-03 Strike=  43.00 Credit=  60', str(rolls))
+
+    def test_tie_on_credit(self):
+        position = Position('INTC', 43.0, date(2022, 5, 20), OptionType.PUT, 0.5)
+        current = PutContract('INTC', date(2022, 5, 20), 43.0, -0.5, 0.4, 0.5)
+        riskier = PutContract('INTC', date(2022, 5, 27), 43.0, -0.5, 0.4, 0.8)
+        safer = PutContract('INTC', date(2022, 6, 3), 43.0, -0.3, 0.4, 0.8)
+        # Ties on credit go to the lower delta, though found later.
+        rolls = thewheel.roll.find_rolls([position],
+                                         ChainIndex([current, riskier, safer]))[0]
+        self.assertEqual([safer, riskier],
+                         [candidate.target for candidate in rolls.candidates])
+        self.assertEqual(rolls.candidates[0].net_credit,
+                         rolls.candidates[1].net_credit)
+
+    def test_bought_back_at_ask(self):
+        position = Position('INTC', 43.0, date(2022, 5, 20), OptionType.PUT, 0.5)
+        current = PutContract('INTC', date(2022, 5, 20), 43.0, -0.5, 0.4, 0.5, 0.7)
+        target = PutContract('INTC', date(2022, 5, 27), 43.0, -0.5, 0.4, 0.8, 0.9)
+        # A credit of 0.30 at the bid is 0.10 after buying back at the ask.
+        rolls = thewheel.roll.find_rolls([position],
+                                         ChainIndex([current, target]))[0]
+        self.assertAlmostEqual(0.1, rolls.candidates[0].net_credit)
+        rolls = thewheel.roll.find_rolls([position],
+                                         ChainIndex([current, target]),
+                                         min_credit=.2)[0]
+        self.assertEqual([], rolls.candidates)
+
+    def test_max_delta(self):
+        position = Position('INTC', 43.0, date(2022, 5, 20), OptionType.PUT, 0.5)
+        rolls = thewheel.roll.find_rolls([position],
+                                         ChainIndex(_chain('INTC', -1)),
+                                         max_delta=.4)[0]
+        for candidate in rolls.candidates:
+            self.assertLessEqual(abs(candidate.target.delta), .4)
+
+    def test_not_in_chain(self):
+        position = Position('INTC', 43.5, date(2022, 5, 20), OptionType.PUT, 0.5)
+        rolls = thewheel.roll.find_rolls([position],
+                                         ChainIndex(_chain('INTC', -1)))[0]
+        self.assertEqual([], rolls.candidates)
+        self.assertIn('Not found', str(rolls))
+
+    def test_no_credit(self):
+        position = Position('INTC', 43.0, date(2022, 6, 3), OptionType.PUT, 0.5)
+        rolls = thewheel.roll.find_rolls([position],
+                                         ChainIndex(_chain('INTC', -1)))[0]
+        self.assertEqual([], rolls.candidates)
+        self.assertIn('No roll for a credit', str(rolls))
+
+
+class GetRollCandidatesTestCase(unittest.TestCase):
+    """Tests get_roll_candidates"""
+    def test_one_fetch_per_chain(self):
+        positions = [Position('INTC', strike, date(2022, 5, 20), OptionType.PUT, 0.5)
+                     for strike in (41.0, 42.0, 43.0)]
+        positions.append(Position('INTC', 44.0, date(2022, 5, 20),
+                                  OptionType.CALL, 0.5))
+        positions.append(Position('NCLH', 44.0, date(2022, 5, 20),
+                                  OptionType.PUT, 0.5))
+
+        def get_calendar_contracts(stock, option_type, *_args, **_kwargs):
+            if stock == 'NCLH':
+                raise thewheel.options_api.OptionsAPIException('NCLH is down')
+            sign = -1 if option_type is OptionType.PUT else 1
+            return ChainResult(stock, _chain(stock, sign), stock != 'INTC'
+                               or option_type is OptionType.PUT)
+
+        with patch('thewheel.options_api.get_calendar_contracts',
+                   side_effect=get_calendar_contracts) as mock_get:
+            results = thewheel.roll.get_roll_candidates(positions)
+
+        self.assertEqual(3, mock_get.call_count)
+        self.assertEqual(positions, [rolls.position for rolls in results])
+        for rolls in results[:3]:
+            self.assertTrue(rolls.candidates)
+            self.assertTrue(rolls.complete)
+        self.assertFalse(results[3].complete)
+        self.assertEqual('NCLH is down', results[4].error)
+
+
+if __name__ == '__main__':
+    unittest.main()
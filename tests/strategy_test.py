@@ -0,0 +1,174 @@
+"""Tests strategy.py"""
+import unittest
+from datetime import date
+
+from tests import get_html_contents
+import thewheel.options_api
+import thewheel.strategy
+from thewheel.config import OptionType
+from thewheel.putcontract import PutContract
+from thewheel.strategy import Collar, Spread
+
+
+def _read_chain(basefilename, stock):
+    return thewheel.options_api.parse_contracts(get_html_contents(basefilename),
+                                                stock)
+
+
+class SpreadTestCase(unittest.TestCase):
+    """Tests Spread"""
+    def setUp(self):
+        short = PutContract('INTC', date(2022, 5, 20), 45, -0.32, 0.37, 0.75)
+        long = PutContract('INTC', date(2022, 5, 20), 43, -0.12, 0.4, 0.25)
+        self.spread = Spread(short, long)
+
+    def test_values(self):
+        self.assertAlmostEqual(2.0, self.spread.width)
+        self.assertAlmostEqual(0.5, self.spread.credit)
+        self.assertAlmostEqual(150.0, self.spread.max_loss)
+        self.assertAlmostEqual(1 / 3, self.spread.return_on_risk)
+        self.assertAlmostEqual(0.2, self.spread.net_delta)
+
+    def test_long_at_ask(self):
+        short = PutContract('INTC', date(2022, 5, 20), 45, -0.32, 0.37, 0.75, 0.8)
+        long = PutContract('INTC', date(2022, 5, 20), 43, -0.12, 0.4, 0.25, 0.35)
+        spread = Spread(short, long)
+        self.assertAlmostEqual(0.4, spread.credit)
+        self.assertAlmostEqual(160.0, spread.max_loss)
+
+    def test_str(self):
+        self.assertEqual('INTC : 2022-05-20 Short=  45.00 Long=  43.00 '
+                         'Credit=  50 MaxLoss=  150 RoR= 33.33% Delta= 0.20',
+                         str(self.spread))
+
+
+class CollarTestCase(unittest.TestCase):
+    """Tests Collar"""
+    def test_values(self):
+        put = PutContract('INTC', date(2022, 5, 20), 43, -0.2, 0.4, 0.3, 0.35)
+        call = PutContract('INTC', date(2022, 5, 20), 47, 0.25, 0.4, 0.45)
+        collar = Collar(put, call)
+        self.assertAlmostEqual(4.0, collar.width)
+        self.assertAlmostEqual(-0.1, collar.net_cost)
+        self.assertAlmostEqual(-0.1 / 43 * 100, collar.cost_percent)
+        self.assertEqual('INTC : 2022-05-20 Put=  43.00 Call=  47.00 '
+                         'Cost=  -10  -0.23% Delta=-0.20/ 0.25', str(collar))
+
+
+class BuildCreditSpreadsTestCase(unittest.TestCase):
+    """Tests build_credit_spreads"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.spy = _read_chain('put_SPY', 'SPY')
+        cls.intc_calls = _read_chain('call_INTC', 'INTC')
+
+    @staticmethod
+    def _brute_force(contracts, is_put, max_width, min_credit_ratio,
+                     max_net_delta, max_short_delta=.5):
+        spreads = []
+        for short in contracts:
+            if abs(short.delta) >= max_short_delta:
+                continue
+            for long in contracts:
+                if short.expiration != long.expiration:
+                    continue
+                width = short.strike - long.strike if is_put \
+                    else long.strike - short.strike
+                if width <= 0 or width > max_width:
+                    continue
+                spread = Spread(short, long)
+                if spread.credit <= 0 or \
+                        spread.credit < min_credit_ratio * width or \
+                        abs(spread.net_delta) > max_net_delta:
+                    continue
+                spreads.append(spread.return_on_risk)
+        return sorted(spreads, reverse=True)
+
+    def test_bull_put_spreads(self):
+        spreads = thewheel.strategy.build_credit_spreads(
+            self.spy, OptionType.PUT, max_width=5, min_credit_ratio=.25,
+            max_net_delta=.2, top=10)
+        expected = self._brute_force(self.spy, True, 5, .25, .2)[:10]
+        self.assertEqual(10, len(spreads))
+        for expected_ror, spread in zip(expected, spreads):
+            self.assertAlmostEqual(expected_ror, spread.return_on_risk)
+        for spread in spreads:
+            self.assertAlmostEqual(spread.short.bid - spread.long.ask,
+                                   spread.credit)
+            self.assertGreaterEqual(spread.credit, .25 * spread.width)
+            self.assertGreater(spread.short.strike, spread.long.strike)
+            self.assertEqual(spread.short.expiration, spread.long.expiration)
+            self.assertLessEqual(spread.width, 5)
+
+    def test_bear_call_spreads(self):
+        spreads = thewheel.strategy.build_credit_spreads(
+            self.intc_calls, OptionType.CALL, max_width=2, top=5)
+        expected = self._brute_force(
+            self.intc_calls, False, 2,
+            thewheel.strategy.DEFAULT_MIN_CREDIT_RATIO,
+            thewheel.strategy.DEFAULT_MAX_NET_DELTA)[:5]
+        self.assertEqual(len(expected), len(spreads))
+        for expected_ror, spread in zip(expected, spreads):
+            self.assertAlmostEqual(expected_ror, spread.return_on_risk)
+            self.assertLess(spread.short.strike, spread.long.strike)
+
+    def test_short_out_of_the_money(self):
+        spreads = thewheel.strategy.build_credit_spreads(self.spy,
+                                                         OptionType.PUT)
+        self.assertEqual(thewheel.strategy.DEFAULT_TOP, len(spreads))
+        for spread in spreads:
+            self.assertLess(abs(spread.short.delta), .5)
+            self.assertLess(abs(spread.long.delta), abs(spread.short.delta))
+
+        spreads = thewheel.strategy.build_credit_spreads(
+            self.spy, OptionType.PUT, max_short_delta=.2)
+        for spread in spreads:
+            self.assertLess(abs(spread.short.delta), .2)
+
+    def test_nothing(self):
+        self.assertEqual([], thewheel.strategy.build_credit_spreads(
+            [], OptionType.PUT))
+
+    def test_top_zero(self):
+        self.assertEqual([], thewheel.strategy.build_credit_spreads(
+            self.spy, OptionType.PUT, top=0))
+
+
+class BuildCollarsTestCase(unittest.TestCase):
+    """Tests build_collars"""
+    def test_collars(self):
+        expiration = date(2022, 5, 20)
+        puts = [PutContract('INTC', expiration, strike, delta, 0.4, bid, bid + .05)
+                for strike, delta, bid in ((42, -0.2, 0.2), (43, -0.3, 0.3),
+                                           (44, -0.45, 0.6), (46, -0.7, 1.8))]
+        calls = [PutContract('INTC', expiration, strike, delta, 0.4, bid)
+                 for strike, delta, bid in ((42, 0.8, 2.2), (44, 0.55, 0.9),
+                                            (45, 0.4, 0.5), (46, 0.25, 0.25))]
+        other = [PutContract('INTC', date(2022, 6, 17), 45, 0.3, 0.4, 5.0)]
+        collars = thewheel.strategy.build_collars(puts, calls + other,
+                                                  max_width=3, top=3)
+        # The 44 and 42 calls and the 46 put are in the money.
+        self.assertEqual([(42, 45), (43, 45), (43, 46)],
+                         [(collar.put.strike, collar.call.strike)
+                          for collar in collars])
+
+    def test_intc(self):
+        puts = _read_chain('put_INTC', 'INTC')
+        calls = _read_chain('call_INTC', 'INTC')
+        collars = thewheel.strategy.build_collars(puts, calls, top=10)
+        self.assertTrue(collars)
+        for collar in collars:
+            self.assertLess(abs(collar.put.delta), .5)
+            self.assertLess(abs(collar.call.delta), .5)
+            self.assertGreater(collar.width, 0)
+        self.assertEqual(sorted(collar.cost_percent for collar in collars),
+                         [collar.cost_percent for collar in collars])
+
+    def test_top_zero(self):
+        puts = [PutContract('INTC', date(2022, 5, 20), 42, -0.3, 0.4, 0.2)]
+        calls = [PutContract('INTC', date(2022, 5, 20), 44, 0.3, 0.4, 0.9)]
+        self.assertEqual([], thewheel.strategy.build_collars(puts, calls, top=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
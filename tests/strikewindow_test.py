@@ -0,0 +1,126 @@
+"""Tests strikewindow.py"""
+import os
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from tests import get_html_contents
+import thewheel.options_api
+import thewheel.strikewindow
+from thewheel.config import OptionType
+from thewheel.putcontract import PutContract
+from thewheel.strikewindow import StrikeWindows
+
+
+def _chain(deltas):
+    """One expiry, in strike order."""
+    return [PutContract('INTC', date(2022, 5, 13), 30.0 + index, delta, 0.5, 1.0)
+            for index, delta in enumerate(deltas)]
+
+
+class StrikeWindowsTestCase(unittest.TestCase):
+    """Tests StrikeWindows"""
+    def test_default(self):
+        windows = StrikeWindows()
+        self.assertEqual(thewheel.options_api.get_strike_range(
+            thewheel.options_api.DEFAULT_STRIKE_RANGE),
+            windows.window('INTC', OptionType.PUT))
+
+    def test_shrinks_to_band(self):
+        windows = StrikeWindows(padding=1)
+        # Strikes 20 to 28.  At the money (-0.5) is strike 24.
+        deltas = [-0.1, -0.15, -0.2, -0.3, -0.5, -0.6, -0.7, -0.8, -0.9]
+        wider = windows.update('INTC', OptionType.PUT, (20, 28),
+                               _chain(deltas), .3, .05)
+        self.assertIsNone(wider)
+        # Band is strike 23.  Padded by 1, and keeps at the money.
+        self.assertEqual((22, 24), windows.window('INTC', OptionType.PUT))
+        # Other sides and stocks are unaffected.
+        self.assertEqual(thewheel.options_api.get_strike_range(14),
+                         windows.window('INTC', OptionType.CALL))
+        self.assertEqual(thewheel.options_api.get_strike_range(14),
+                         windows.window('SPY', OptionType.PUT))
+
+    def test_widens_at_edge(self):
+        windows = StrikeWindows(padding=2)
+        # Strikes 22 to 26, the band at the low edge.
+        deltas = [-0.3, -0.35, -0.5, -0.6, -0.7]
+        wider = windows.update('INTC', OptionType.PUT, (22, 26),
+                               _chain(deltas), .3, .05)
+        self.assertEqual((18, 26), wider)
+
+    def test_widens_to_limit(self):
+        windows = StrikeWindows(padding=2)
+        minimum = thewheel.options_api.STRIKE_MINIMUM
+        deltas = [-0.3] * (24 - minimum) + [-0.5]
+        chain = _chain(deltas)
+        self.assertIsNone(windows.update('INTC', OptionType.PUT,
+                                         (minimum, 24), chain, .3, .05))
+        self.assertEqual((minimum, 25), windows.window('INTC', OptionType.PUT))
+
+    def test_band_not_found(self):
+        windows = StrikeWindows()
+        deltas = [-0.1, -0.5, -0.9]
+        self.assertEqual(thewheel.options_api.get_strike_range(14),
+                         windows.update('INTC', OptionType.PUT, (23, 25),
+                                        _chain(deltas), .3, .05))
+        self.assertIsNone(windows.update('INTC', OptionType.PUT,
+                                         thewheel.options_api.get_strike_range(14),
+                                         _chain(deltas), .3, .05))
+
+    def test_save_load(self):
+        windows = StrikeWindows(padding=1)
+        deltas = [-0.1, -0.15, -0.2, -0.3, -0.5, -0.6, -0.7, -0.8, -0.9]
+        windows.update('INTC', OptionType.PUT, (20, 28), _chain(deltas), .3, .05)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'windows.json')
+            windows.save(path)
+
+            # New process.
+            windows = StrikeWindows()
+            windows.load(path)
+            self.assertEqual((22, 24), windows.window('INTC', OptionType.PUT))
+
+            with open(path, 'w', encoding='utf-8') as windows_file:
+                windows_file.write('garbage')
+            windows = StrikeWindows()
+            windows.load(path)
+            windows.load(os.path.join(temp_dir, 'missing.json'))
+        self.assertEqual(thewheel.options_api.get_strike_range(14),
+                         windows.window('INTC', OptionType.PUT))
+
+
+class GetPutContractsTestCase(unittest.TestCase):
+    """Tests get_put_contracts"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.intc_html = get_html_contents('put_INTC')
+
+    def test_intc(self):
+        windows = StrikeWindows()
+        with patch('thewheel.options_api.get_html',
+                   return_value=self.intc_html) as mock_get_html:
+            contracts = thewheel.strikewindow.get_put_contracts(
+                'INTC', OptionType.PUT, .3, .05, windows)
+            self.assertEqual((10, 38), mock_get_html.call_args[0][3])
+
+            thewheel.strikewindow.get_put_contracts(
+                'INTC', OptionType.PUT, .3, .05, windows)
+            self.assertEqual((18, 25), mock_get_html.call_args[0][3])
+
+        self.assertTrue(any(contract.is_delta_in_range(.3, .05)
+                            for contract in contracts))
+
+    def test_all_expiries(self):
+        windows = StrikeWindows()
+        with patch('thewheel.options_api.get_calendar_contracts',
+                   return_value=thewheel.options_api.ChainResult(
+                       'INTC', _chain([-0.3, -0.5, -0.7]))) as mock_get:
+            thewheel.strikewindow.get_put_contracts(
+                'INTC', OptionType.PUT, .3, .05, windows, all_expiries=True)
+        self.assertEqual((10, 38), mock_get.call_args[1]['strikes'])
+
+
+if __name__ == '__main__':
+    unittest.main()
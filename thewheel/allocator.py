@@ -0,0 +1,263 @@
+"""Allocates cash across screened contracts.
+
+Each contract sold ties up PutContract.cost.  allocate() picks how many of
+each contract to sell to get the most premium (or annualized premium)
+without going over:
+
+* The cash budget.
+* A cap per symbol.  Optional.
+* A cap per sector.  Optional.
+
+This is a knapsack problem.  The caps nest (symbols within sectors within
+the budget), so it is solved exactly, bottom up, with dynamic programming
+over cash measured in units:
+
+1. Symbol: unbounded knapsack over its contracts.  Only the best contract
+   for each cost matters, so thousands of candidates collapse to one per
+   strike.
+2. Sector: combine its symbols, limited by the sector cap.
+3. Budget: combine the sectors, limited by the cash.
+
+Costs are rounded up to a whole number of units and caps rounded down, so
+the result never goes over.  The unit is the largest that divides every
+cost, but at most MAX_UNITS units fit in the budget, which bounds the time.
+"""
+import math
+from datetime import date
+
+PREMIUM = 'premium'
+ANNUALIZED = 'annualized'
+OBJECTIVES = (PREMIUM, ANNUALIZED)
+
+DAYS_PER_YEAR = 365
+MAX_UNITS = 2000
+
+
+class Allocation:
+    """Result of allocate()."""
+    def __init__(self, positions, value):
+        """Constructor
+
+        :param list[tuple[PutContract,int]] positions: Contract and quantity.
+        :param float value: Objective value.
+        """
+        self.positions = positions
+        self.value = value
+
+    @property
+    def cost(self) -> float:
+        """Returns the cash tied up."""
+        return sum(contract.cost * quantity
+                   for contract, quantity in self.positions)
+
+    @property
+    def premium(self) -> float:
+        """Returns the premium collected, in dollars."""
+        return sum(contract.premium * quantity
+                   for contract, quantity in self.positions)
+
+    def __str__(self) -> str:
+        """Class as a printable string."""
+        lines = [f'{quantity:3}x {str(contract)}'
+                 for contract, quantity in self.positions]
+        lines.append(f'Premium={self.premium:.0f} Cost={self.cost:.0f}')
+        return '\n'.join(lines)
+
+
+def contract_value(contract, objective=PREMIUM, today=None):
+    """Returns the value of selling one contract.
+
+    :param thewheel.putcontract.PutContract contract: Contract
+    :param str objective: PREMIUM or ANNUALIZED
+    :param date today: Used for days to expiry.  Defaults to today.
+    :rtype: float
+    """
+    if objective == PREMIUM:
+        return contract.premium
+    if objective == ANNUALIZED:
+        if today is None:
+            today = date.today()
+        days = max((contract.expiration - today).days, 1)
+        return contract.premium * DAYS_PER_YEAR / days
+    raise ValueError(f'Objective {objective} is not one of {OBJECTIVES}')
+
+
+def allocate(contracts, cash, objective=PREMIUM, symbol_caps=None,
+             sectors=None, sector_caps=None, today=None):
+    """Picks contract quantities that maximize the objective.
+
+    :param list[thewheel.putcontract.PutContract] contracts: Candidates,
+        from any number of chains.
+    :param float cash: Cash budget.
+    :param str objective: PREMIUM or ANNUALIZED
+    :param dict[str,float] symbol_caps: Optional.  Maximum cost per symbol.
+    :param dict[str,str] sectors: Optional.  Sector of each symbol.
+        Symbols without one are in a sector of their own.
+    :param dict[str,float] sector_caps: Optional.  Maximum cost per sector.
+    :param date today: Used by ANNUALIZED.  Defaults to today.
+    :rtype: Allocation
+    """
+    symbol_caps = symbol_caps or {}
+    sectors = sectors or {}
+    sector_caps = sector_caps or {}
+
+    candidates = [(contract, contract_value(contract, objective, today))
+                  for contract in contracts
+                  if 0 < contract.cost <= cash]
+    candidates = [(contract, value) for contract, value in candidates
+                  if value > 0]
+    if not candidates:
+        return Allocation([], 0.0)
+
+    unit = _unit([contract.cost for contract, _ in candidates], cash)
+    capacity = int(cash // unit)
+
+    # Best contract for each cost, per symbol.
+    by_symbol = {}
+    for contract, value in candidates:
+        weight = math.ceil(round(contract.cost / unit, 9))
+        best = by_symbol.setdefault(contract.stock, {})
+        if weight not in best or value > best[weight][1]:
+            best[weight] = (contract, value)
+
+    by_sector = {}
+    for symbol, best in by_symbol.items():
+        limit = _limit(symbol_caps.get(symbol), unit, capacity)
+        items = [(weight, value, contract)
+                 for weight, (contract, value) in sorted(best.items())]
+        table = _unbounded_knapsack(items, limit)
+        sector = sectors.get(symbol, symbol)
+        by_sector.setdefault(sector, []).append((symbol, items, table))
+
+    sector_tables = []
+    for sector, symbol_tables in by_sector.items():
+        limit = _limit(sector_caps.get(sector), unit, capacity)
+        steps = _combine([table for _, _, table in symbol_tables], limit)
+        sector_tables.append((symbol_tables, steps))
+
+    budget_steps = _combine([steps[-1] for _, steps in sector_tables],
+                            capacity)
+
+    # Walk back down, from the budget to sectors to symbols.
+    quantities = {}
+    sector_units = _split(budget_steps,
+                          [steps[-1] for _, steps in sector_tables], capacity)
+    for (symbol_tables, steps), units in zip(sector_tables, sector_units):
+        symbol_units = _split(steps, [table for _, _, table in symbol_tables],
+                              units)
+        for (_, items, table), units in zip(symbol_tables, symbol_units):
+            for contract in _pick_items(items, table, units):
+                quantities[contract] = quantities.get(contract, 0) + 1
+
+    positions = [(contract, quantity) for contract, quantity in
+                 sorted(quantities.items(),
+                        key=lambda item: (item[0].stock, item[0].expiration,
+                                          item[0].strike))]
+    return Allocation(positions, budget_steps[-1][capacity])
+
+
+def _unit(costs, cash):
+    """Returns the size of a unit of cash, in dollars."""
+    unit = 0
+    for cost in costs:
+        unit = math.gcd(unit, round(cost))
+    unit = max(unit, 1)
+    return max(unit, math.ceil(cash / MAX_UNITS))
+
+
+def _limit(cap, unit, capacity):
+    """Returns a cap in units."""
+    if cap is None:
+        return capacity
+    return max(0, min(capacity, int(cap // unit)))
+
+
+def _unbounded_knapsack(items, limit):
+    """Returns the best value using at most c units, for c up to limit.
+
+    :param list[tuple[int,float,PutContract]] items: Weight, value, contract.
+    :param int limit: Units.
+    :rtype: list[float]
+    """
+    best = [0.0] * (limit + 1)
+    for units in range(1, limit + 1):
+        value = best[units - 1]
+        for weight, item_value, _ in items:
+            if weight > units:
+                break
+            candidate = best[units - weight] + item_value
+            if candidate > value:
+                value = candidate
+        best[units] = value
+    return best
+
+
+def _pick_items(items, table, units):
+    """Returns the contracts behind table[units]."""
+    picked = []
+    while units > 0:
+        if table[units] == table[units - 1]:
+            units -= 1
+            continue
+        for weight, item_value, contract in items:
+            if weight <= units and \
+                    table[units - weight] + item_value == table[units]:
+                picked.append(contract)
+                units -= weight
+                break
+    return picked
+
+
+def _breakpoints(table):
+    """Returns the units where the table improves.  Using other units only
+    wastes cash, so combining only needs these."""
+    points = [0]
+    for units in range(1, len(table)):
+        if table[units] > table[units - 1]:
+            points.append(units)
+    return points
+
+
+def _combine(tables, limit):
+    """Combines tables (max-plus convolution), limited to limit units.
+
+    :param list[list[float]] tables: Best value for c units, per group.
+    :param int limit: Units.
+    :rtype: list[list[float]]
+    :returns: The combined table after each group.  The last is the result.
+    """
+    steps = []
+    combined = [0.0] * (limit + 1)
+    for table in tables:
+        result = list(combined)
+        for units in _breakpoints(table):
+            if units == 0 or units > limit:
+                continue
+            value = table[units]
+            shifted = [previous + value
+                       for previous in combined[:limit + 1 - units]]
+            result[units:] = map(max, result[units:], shifted)
+        combined = result
+        steps.append(combined)
+    return steps
+
+
+def _split(steps, tables, units):
+    """Returns the units each table used, walking back through steps."""
+    used = []
+    for index in range(len(tables) - 1, -1, -1):
+        target = steps[index][units]
+        previous = steps[index - 1] if index > 0 else None
+        table = tables[index]
+        for group_units in _breakpoints(table):
+            if group_units > units:
+                break
+            before = previous[units - group_units] if previous else 0.0
+            if before + table[group_units] == target:
+                break
+        else:
+            group_units = 0
+        used.append(group_units)
+        units -= group_units
+    used.reverse()
+    return used
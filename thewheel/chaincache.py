@@ -0,0 +1,279 @@
+"""Caches parsed option chains, keyed by a hash of the HTML document.
+
+Parsing a chain with BeautifulSoup is the expensive part of a poll.  When the
+page has not changed, the hash of the document (plus the parser version)
+finds the previously parsed contracts instead.
+
+There are two tiers:
+
+* Memory - LRU, bounded by a byte budget.
+* Disk - One small binary file per chain.  Optional.  Survives restarts.
+  Bounded by a byte budget; the least recently used files are removed first.
+
+Both tiers hold the same packed binary form of the chain, so the memory
+budget is an exact count of bytes.
+"""
+import hashlib
+import math
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from thewheel.putcontract import PutContract
+
+DEFAULT_MEMORY_BUDGET = 8 * 1024 * 1024    # Bytes.
+DEFAULT_DISK_BUDGET = 64 * 1024 * 1024     # Bytes.
+FILE_EXTENSION = '.chain'
+
+# Binary format, little endian:
+#   header: magic, format version, stock length, contract count
+#   stock:  utf-8 bytes
+#   record: expiration (date ordinal), strike, delta, implied vol, bid, ask
+# An unknown ask is stored as NaN.
+_MAGIC = b'TWPC'
+_FORMAT_VERSION = 2
+_HEADER = struct.Struct('<4sBHI')
+_RECORD = struct.Struct('<i5d')
+
+
+def make_key(html_contents, stock, parser_version):
+    """Returns the cache key for a document.
+
+    :param str html_contents: HTML document
+    :param str stock: Stock symbol.  Part of every parsed contract.
+    :param int parser_version: Bump when the parser output changes.
+    :rtype: str
+    :returns: Hex digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(f'{parser_version}:{stock}:'.encode('utf-8'))
+    digest.update(html_contents.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def pack_contracts(stock, contracts):
+    """Packs contracts into the binary format.
+
+    :param str stock: Stock symbol
+    :param list[PutContract] contracts: Contracts, all for stock.
+    :rtype: bytes
+    """
+    stock_bytes = stock.encode('utf-8')
+    parts = [_HEADER.pack(_MAGIC, _FORMAT_VERSION,
+                          len(stock_bytes), len(contracts)),
+             stock_bytes]
+    for contract in contracts:
+        parts.append(_RECORD.pack(contract.expiration.toordinal(),
+                                  contract.strike, contract.delta,
+                                  contract.implied_vol, contract.bid,
+                                  math.nan if contract.ask is None
+                                  else contract.ask))
+    return b''.join(parts)
+
+
+def unpack_contracts(data):
+    """Unpacks contracts from the binary format.
+
+    :param bytes data: Output of pack_contracts()
+    :rtype: list[PutContract]
+    :raises ValueError: If data is not in the binary format.
+    """
+    try:
+        magic, version, stock_length, count = _HEADER.unpack_from(data)
+    except struct.error as error:
+        raise ValueError(f'Truncated chain header: {str(error)}') from error
+    if magic != _MAGIC or version != _FORMAT_VERSION:
+        raise ValueError(f'Unknown chain format: {magic} {version}')
+    offset = _HEADER.size
+    stock = data[offset:offset + stock_length].decode('utf-8')
+    offset += stock_length
+    if len(data) != offset + count * _RECORD.size:
+        raise ValueError(f'Chain size mismatch: {len(data)} bytes '
+                         f'for {count} contracts')
+
+    contracts = []
+    # Expirations repeat for every strike, so only build each date once.
+    dates = {}
+    for ordinal, strike, delta, implied_vol, bid, ask in \
+            _RECORD.iter_unpack(data[offset:]):
+        expiration = dates.get(ordinal)
+        if expiration is None:
+            expiration = dates[ordinal] = date.fromordinal(ordinal)
+        contracts.append(PutContract(stock, expiration,
+                                     strike, delta, implied_vol, bid,
+                                     None if math.isnan(ask) else ask))
+    return contracts
+
+
+class ChainCache:
+    """Two tier (memory and disk) cache of parsed option chains."""
+    def __init__(self, directory=None, memory_budget=DEFAULT_MEMORY_BUDGET,
+                 disk_budget=DEFAULT_DISK_BUDGET):
+        """Constructor
+
+        :param str directory: Directory for the disk tier.
+            None disables the disk tier.
+        :param int memory_budget: Maximum bytes held in memory.
+        :param int disk_budget: Maximum bytes held on disk.
+        """
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.prune()
+
+    @property
+    def hits(self) -> int:
+        """Returns the total hits from both tiers."""
+        return self.memory_hits + self.disk_hits
+
+    def get(self, key):
+        """Returns the cached contracts.
+
+        :param str key: From make_key()
+        :rtype: list[PutContract] or None
+        :returns: Contracts or None if not cached.
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+        if data is not None:
+            return unpack_contracts(data)
+
+        data = self._read_file(key)
+        if data is not None:
+            try:
+                contracts = unpack_contracts(data)
+            except ValueError:
+                # Corrupt or old format.  Parse it again.
+                contracts = None
+            if contracts is not None:
+                with self._lock:
+                    self._remember(key, data)
+                    self.disk_hits += 1
+                return contracts
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, stock, contracts):
+        """Stores contracts in both tiers.
+
+        :param str key: From make_key()
+        :param str stock: Stock symbol
+        :param list[PutContract] contracts: Parsed contracts
+        """
+        data = pack_contracts(stock, contracts)
+        with self._lock:
+            self._remember(key, data)
+        self._write_file(key, data)
+
+    def prune(self):
+        """Removes the least recently used files until the disk tier is
+        within its budget.
+
+        :rtype: int
+        :returns: Number of files removed.
+        """
+        if self.directory is None:
+            return 0
+        files = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(FILE_EXTENSION):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError as error:
+            print(f'Warning: Unable to prune chain cache: {str(error)}')
+            return 0
+
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in files:
+            if total <= self.disk_budget:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as error:
+                print(f'Warning: Unable to prune chain cache: {str(error)}')
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self.disk_bytes = total
+        return removed
+
+    def clear(self):
+        """Empties the memory tier.  The disk tier is left alone."""
+        with self._lock:
+            self._memory.clear()
+            self.memory_bytes = 0
+
+    def _remember(self, key, data):
+        """Adds to the memory tier, evicting the least recently used.
+        Call with the lock held."""
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self.memory_bytes -= len(old)
+        if len(data) > self.memory_budget:
+            return
+        self._memory[key] = data
+        self.memory_bytes += len(data)
+        while self.memory_bytes > self.memory_budget:
+            _, evicted = self._memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}{FILE_EXTENSION}')
+
+    def _read_file(self, key):
+        """Returns the bytes on disk or None."""
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as chain_file:
+                data = chain_file.read()
+            # Recently used, so pruned last.
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def _write_file(self, key, data):
+        """Writes to disk.  Atomic, so readers never see a partial file."""
+        if self.directory is None:
+            return
+        try:
+            handle, temp_path = tempfile.mkstemp(dir=self.directory,
+                                                 suffix='.tmp')
+            with os.fdopen(handle, 'wb') as chain_file:
+                chain_file.write(data)
+            os.replace(temp_path, self._path(key))
+        except OSError as error:
+            print(f'Warning: Unable to write chain cache: {str(error)}')
+            return
+        with self._lock:
+            # Overwrites count twice, which only prunes a little early.
+            self.disk_bytes += len(data)
+            over_budget = self.disk_bytes > self.disk_budget
+        if over_budget:
+            self.prune()
@@ -1,6 +1,16 @@
 """Command Line Interface (cli)"""
+import os
+
+import thewheel.allocator
+import thewheel.chaincache
 import thewheel.config
+import thewheel.deadline
+import thewheel.metrics
 import thewheel.options_api
+import thewheel.roll
+import thewheel.strikewindow
+
+STRIKE_WINDOWS_FILE = 'strike_windows.json'
 
 
 def main(argv):
@@ -8,15 +18,73 @@ def main(argv):
 
     * Handle command line options.
     """
-    the_config = thewheel.config.Config(argv)
+    if argv and argv[0] == 'allocate':
+        the_config = thewheel.config.AllocateConfig(argv[1:])
+        run = _run_allocate
+    elif argv and argv[0] == 'roll':
+        the_config = thewheel.config.RollConfig(argv[1:])
+        run = _run_roll
+    else:
+        the_config = thewheel.config.Config(argv)
+        run = _run
 
     print(f'Running with: {str(the_config)}')
 
+    deadline = None
+    if the_config.deadline is not None:
+        deadline = thewheel.deadline.Deadline(the_config.deadline)
+
+    cache = None
+    if the_config.cache_dir is not None:
+        cache = thewheel.chaincache.ChainCache(the_config.cache_dir)
+
+    windows = None
+    windows_file = None
+    if the_config.adaptive_strikes:
+        windows = thewheel.strikewindow.StrikeWindows(
+            strike_range=the_config.strike_range)
+        if the_config.cache_dir is not None:
+            windows_file = os.path.join(the_config.cache_dir,
+                                        STRIKE_WINDOWS_FILE)
+            windows.load(windows_file)
+
+    if the_config.metrics_file is not None:
+        thewheel.metrics.REGISTRY.enabled = True
     try:
-        contracts = \
-            thewheel.options_api.get_put_contracts(the_config.stock,
-                                                   the_config.option_type,
-                                                   the_config.strike_range)
+        return run(the_config, cache, deadline, windows)
+    finally:
+        if windows_file is not None:
+            windows.save(windows_file)
+        if the_config.metrics_file is not None:
+            thewheel.metrics.REGISTRY.dump(the_config.metrics_file)
+
+
+def _get_contracts(the_config, stock, cache, deadline, windows):
+    """Gets the contracts for one stock."""
+    if windows is not None:
+        contracts = thewheel.strikewindow.get_put_contracts(
+            stock, the_config.option_type, the_config.delta,
+            the_config.delta_range, windows, cache, deadline,
+            the_config.all_expiries)
+    elif the_config.all_expiries:
+        contracts = thewheel.options_api.get_calendar_contracts(
+            stock, the_config.option_type, the_config.strike_range, cache,
+            deadline=deadline)
+    else:
+        contracts = thewheel.options_api.get_put_contracts(
+            stock, the_config.option_type, the_config.strike_range, cache,
+            deadline=deadline)
+    if not contracts.complete:
+        print(f'Warning: Deadline reached.  {stock} is partial: '
+              f'{len(contracts)} contracts.')
+    return contracts
+
+
+def _run(the_config, cache, deadline, windows):
+    """Gets the contracts and prints the ones in range."""
+    try:
+        contracts = _get_contracts(the_config, the_config.stock, cache,
+                                   deadline, windows)
     except thewheel.options_api.OptionsAPIException as error:
         print(str(error))
         return 1
@@ -26,3 +94,61 @@ def main(argv):
             print(str(contract))
 
     return 0
+
+
+def _run_allocate(the_config, cache, deadline, windows):
+    """Gets the contracts for every stock and allocates the cash.
+
+    A stock whose chain fails is skipped; the cash is allocated over the rest.
+    """
+    candidates = []
+    for stock in the_config.stocks:
+        try:
+            contracts = _get_contracts(the_config, stock, cache, deadline,
+                                       windows)
+        except thewheel.options_api.OptionsAPIException as error:
+            print(f'Warning: Skipping {stock}: {str(error)}')
+            continue
+        candidates.extend(
+            contract for contract in contracts
+            if contract.is_delta_in_range(the_config.delta,
+                                          the_config.delta_range))
+
+    symbol_caps = None
+    if the_config.symbol_cap is not None:
+        symbol_caps = {stock: the_config.symbol_cap
+                       for stock in the_config.stocks}
+    sector_caps = None
+    if the_config.sector_cap is not None:
+        sector_caps = {sector: the_config.sector_cap
+                       for sector in the_config.sectors.values()}
+
+    allocation = thewheel.allocator.allocate(candidates, the_config.cash,
+                                             the_config.objective,
+                                             symbol_caps,
+                                             the_config.sectors,
+                                             sector_caps)
+    print(str(allocation))
+    return 0
+
+
+def _run_roll(the_config, cache, deadline, _windows):
+    """Reads the positions and prints the roll candidates for each.
+
+    Rolls can go to any strike, not a delta band, so the adaptive strike
+    window is not used.
+    """
+    try:
+        positions = thewheel.roll.read_positions(the_config.positions_file)
+    except (OSError, ValueError) as error:
+        print(str(error))
+        return 1
+
+    for rolls in thewheel.roll.get_roll_candidates(positions,
+                                                   the_config.strike_range,
+                                                   cache, deadline,
+                                                   the_config.top,
+                                                   the_config.min_credit,
+                                                   the_config.max_delta):
+        print(str(rolls))
+    return 0
@@ -5,6 +5,8 @@ from enum import Enum
 
 import thewheel.version
 import thewheel.options_api
+import thewheel.allocator
+import thewheel.roll
 
 
 DEFAULT_DELTA = .3
@@ -25,8 +27,54 @@ def _print_help():
     print(f'    -r|--range=: Range for delta. Optional. Defaults to {DEFAULT_RANGE}')
     print(f'    --strike=: Range for strike.  Optional.  Defaults to '
           f'{thewheel.options_api.DEFAULT_STRIKE_RANGE}')
+    print('    --all-expiries: Every expiry, not just the first few.  Optional.')
+    print('    --adaptive-strikes: Only request the strikes around the delta '
+          'band.  Remembered in the cache directory.  Optional.')
+    print('    --cache=: Directory to cache parsed option chains.  Optional.')
+    print('    --deadline=: Seconds to get option chains in.  What arrived in '
+          'time is used.  Optional.')
+    print('    --metrics=: File to write metrics to on exit.  JSON if it ends '
+          'with .json, otherwise Prometheus text.  Optional.')
     print('    Ex: python thewheel -p -sINTC -d.3 -r.03')
     print('    Ex: python thewheel --call --stock=INTC --delta=.3 --range=.03')
+    print('python thewheel allocate [options]: See python thewheel allocate -h')
+    print('python thewheel roll [options]: See python thewheel roll -h')
+
+
+def _print_allocate_help():
+    print('python thewheel allocate [options]')
+    print('    Picks how many of each contract in the delta range to sell.')
+    print('    Takes the options above, plus:')
+    print('    -s|--stock=: Stock symbols, comma separated. Required. Ex: INTC,NCLH')
+    print('    --cash=: Cash budget. Required.')
+    print('    --symbol-cap=: Maximum cost per symbol.  Optional.')
+    print('    --sector=: Sector of each symbol.  Optional.  Ex: INTC:tech,NCLH:travel')
+    print('    --sector-cap=: Maximum cost per sector.  Optional.')
+    print('    --annualized: Maximize annualized premium.  Optional.  '
+          'Defaults to premium.')
+    print('    Ex: python thewheel allocate -p -sINTC,NCLH --cash=20000 --symbol-cap=12000')
+
+
+def _print_roll_help():
+    print('python thewheel roll [options]')
+    print('    Finds rolls for a credit for open short puts and calls.')
+    print('    -h|--help: Print help')
+    print('    --positions=: CSV file of open positions. Required.')
+    print(f'        Columns: {",".join(thewheel.roll.POSITION_COLUMNS)}')
+    print('        Ex: INTC,45,2022-05-20,put,0.75')
+    print(f'    --top=: Candidates per position.  Optional.  Defaults to '
+          f'{thewheel.roll.DEFAULT_TOP}')
+    print(f'    --min-credit=: Least net credit per share.  Optional.  '
+          f'Defaults to {thewheel.roll.DEFAULT_MIN_CREDIT}')
+    print('    --max-delta=: Most delta of the new contract.  Optional.')
+    print(f'    --strike=: Range for strike.  Optional.  Defaults to '
+          f'{thewheel.options_api.DEFAULT_STRIKE_RANGE}')
+    print('    --cache=: Directory to cache parsed option chains.  Optional.')
+    print('    --deadline=: Seconds to get option chains in.  What arrived in '
+          'time is used.  Optional.')
+    print('    --metrics=: File to write metrics to on exit.  JSON if it ends '
+          'with .json, otherwise Prometheus text.  Optional.')
+    print('    Ex: python thewheel roll --positions=positions.csv --top=5')
 
 
 class OptionType(Enum):
@@ -37,6 +85,12 @@ class OptionType(Enum):
 
 class Config:
     """Read configuration in from command line and holds it."""
+    SHORT_OPTIONS = 'vhcps:d:r:'
+    LONG_OPTIONS = ['version', 'help', 'call', 'put',
+                    'stock=', 'delta=', 'range=', 'strike=',
+                    'all-expiries', 'adaptive-strikes', 'cache=',
+                    'deadline=', 'metrics=']
+
     def __init__(self, argv):
         put = False
         call = False
@@ -45,18 +99,26 @@ class Config:
         self.delta = DEFAULT_DELTA
         self.delta_range = DEFAULT_RANGE
         self.strike_range = thewheel.options_api.DEFAULT_STRIKE_RANGE
+        self.all_expiries = False
+        self.adaptive_strikes = False
+        self.cache_dir = None
+        self.deadline = None
+        self.metrics_file = None
 
         # Handle command line options.
-        options, _ = getopt.getopt(argv,
-                                   'vhcps:d:r:',
-                                   ['version', 'help', 'call', 'put',
-                                    'stock=', 'delta=', 'range=', 'strike='])
+        try:
+            options, _ = getopt.getopt(argv, self.SHORT_OPTIONS,
+                                       self.LONG_OPTIONS)
+        except getopt.GetoptError as error:
+            print(f'\n{error}.\n')
+            self._print_help()
+            sys.exit(1)
         for option, opt_value in options:
             if option in ('-v', '--version'):
                 _print_version()
                 sys.exit(0)
             elif option in ('-h', '--help'):
-                _print_help()
+                self._print_help()
                 sys.exit(1)
             elif option in ('-c', '--call'):
                 call = True
@@ -70,20 +132,36 @@ class Config:
                 self.delta_range = float(opt_value)
             elif option in '--strike':
                 self.strike_range = int(opt_value)
+            elif option == '--all-expiries':
+                self.all_expiries = True
+            elif option == '--adaptive-strikes':
+                self.adaptive_strikes = True
+            elif option == '--cache':
+                self.cache_dir = opt_value
+            elif option == '--deadline':
+                self.deadline = float(opt_value)
+            elif option == '--metrics':
+                self.metrics_file = opt_value
+            else:
+                self._handle_option(option, opt_value)
 
+        self._check_options(put, call)
+
+    def _check_options(self, put, call):
+        """Checks required options are there, exiting if not."""
         if self.stock is None:
             print('\nMissing required stock (-s|--stock).\n')
-            _print_help()
+            self._print_help()
             sys.exit(1)
 
         if not put and not call:
             print('\nMissing required call and put (-c|--call or -p|--put).\n')
-            _print_help()
+            self._print_help()
             sys.exit(1)
 
         if put and call:
             print('\nCannot specifiy both call and put (-c|--call and -p|--put).\n')
-            _print_help()
+            self._print_help()
             sys.exit(1)
 
         if put:
@@ -95,3 +173,106 @@ class Config:
         """Returns string representation."""
         return f'{self.option_type.value} stock={self.stock} delta={self.delta} range={self.delta_range} ' \
                f'strike={self.strike_range}'
+
+    def _handle_option(self, option, opt_value):
+        """Handles options added by subclasses."""
+
+    @staticmethod
+    def _print_help():
+        _print_help()
+
+
+class AllocateConfig(Config):
+    """Configuration for the allocate subcommand."""
+    LONG_OPTIONS = Config.LONG_OPTIONS + ['cash=', 'symbol-cap=', 'sector=',
+                                          'sector-cap=', 'annualized']
+
+    def __init__(self, argv):
+        self.cash = None
+        self.symbol_cap = None
+        self.sectors = {}
+        self.sector_cap = None
+        self.objective = thewheel.allocator.PREMIUM
+        super().__init__(argv)
+        self.stocks = self.stock.split(',')
+
+        if self.cash is None:
+            print('\nMissing required cash (--cash).\n')
+            self._print_help()
+            sys.exit(1)
+
+    def _handle_option(self, option, opt_value):
+        if option == '--cash':
+            self.cash = float(opt_value)
+        elif option == '--symbol-cap':
+            self.symbol_cap = float(opt_value)
+        elif option == '--sector':
+            for pair in opt_value.split(','):
+                symbol, _, sector = pair.partition(':')
+                if not symbol or not sector:
+                    print(f'\nInvalid sector (--sector): {pair}.  '
+                          f'Expected SYMBOL:SECTOR.\n')
+                    self._print_help()
+                    sys.exit(1)
+                self.sectors[symbol] = sector
+        elif option == '--sector-cap':
+            self.sector_cap = float(opt_value)
+        elif option == '--annualized':
+            self.objective = thewheel.allocator.ANNUALIZED
+
+    @staticmethod
+    def _print_help():
+        _print_help()
+        _print_allocate_help()
+
+    def __str__(self) -> str:
+        """Returns string representation."""
+        return f'{super().__str__()} cash={self.cash} ' \
+               f'symbol_cap={self.symbol_cap} sector_cap={self.sector_cap} ' \
+               f'objective={self.objective}'
+
+
+class RollConfig(Config):
+    """Configuration for the roll subcommand.
+
+    Positions have their own stock, side and expiry, and rolls can go to any
+    strike, so only the options roll uses are accepted.
+    """
+    SHORT_OPTIONS = 'vh'
+    LONG_OPTIONS = ['version', 'help', 'strike=', 'cache=', 'deadline=',
+                    'metrics=', 'positions=', 'top=', 'min-credit=',
+                    'max-delta=']
+
+    def __init__(self, argv):
+        self.positions_file = None
+        self.top = thewheel.roll.DEFAULT_TOP
+        self.min_credit = thewheel.roll.DEFAULT_MIN_CREDIT
+        self.max_delta = None
+        super().__init__(argv)
+
+    def _handle_option(self, option, opt_value):
+        if option == '--positions':
+            self.positions_file = opt_value
+        elif option == '--top':
+            self.top = int(opt_value)
+        elif option == '--min-credit':
+            self.min_credit = float(opt_value)
+        elif option == '--max-delta':
+            self.max_delta = float(opt_value)
+
+    def _check_options(self, put, call):
+        """Positions have their own stock and side."""
+        if self.positions_file is None:
+            print('\nMissing required positions (--positions).\n')
+            self._print_help()
+            sys.exit(1)
+
+    @staticmethod
+    def _print_help():
+        _print_roll_help()
+
+    def __str__(self) -> str:
+        """Returns string representation."""
+        return f'roll positions={self.positions_file} top={self.top} ' \
+               f'min_credit={self.min_credit} max_delta={self.max_delta} ' \
+               f'strike={self.strike_range}'
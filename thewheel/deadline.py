@@ -0,0 +1,35 @@
+"""Time budget for retrieving option chains."""
+import time
+
+
+class Deadline:
+    """A point in time that work must finish by."""
+    def __init__(self, seconds, clock=time.monotonic):
+        """Constructor
+
+        :param float seconds: Seconds from now.
+        :param clock: Returns seconds.  For tests.
+        """
+        self._clock = clock
+        self.expires_at = clock() + seconds
+
+    def remaining(self) -> float:
+        """Returns the seconds left, never less than 0."""
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self) -> bool:
+        """Returns True if out of time."""
+        return self._clock() >= self.expires_at
+
+
+def remaining(deadline, default=None):
+    """Returns the seconds left on a deadline, or default if there is none.
+
+    :param Deadline deadline: Deadline or None.
+    :param float default: Returned when deadline is None.
+    :rtype: float or None
+    """
+    if deadline is None:
+        return default
+    return deadline.remaining()
@@ -0,0 +1,305 @@
+"""Resilient HTTP POST for fetching option chains.
+
+* Timeout on every attempt.
+* Retries with jittered exponential backoff on connection errors, timeouts
+  and 429/5xx responses.
+* Hedging.  Optional.  If an attempt takes longer than the p95 of recent
+  latencies, a duplicate request is sent and the first response wins.
+* Circuit breaker per host.  After enough consecutive failures, fail fast
+  until reset_timeout has passed, then let one request through to test it.
+* Deadline.  Optional.  Attempts, backoff and hedging never run past it.
+
+Failures raise FetchError.
+"""
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+
+import thewheel.deadline
+import thewheel.metrics
+
+DEFAULT_TIMEOUT = 10.0        # Seconds, per attempt.
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = .5          # Seconds, doubled each retry.
+DEFAULT_MAX_BACKOFF = 8.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0  # Seconds.
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_METRICS = thewheel.metrics.REGISTRY
+RETRIES = _METRICS.counter('thewheel_fetch_retries_total',
+                           'Fetch attempts retried.')
+HEDGES = _METRICS.counter('thewheel_fetch_hedges_total',
+                          'Hedged duplicate requests sent.')
+CIRCUIT_REJECTIONS = _METRICS.counter('thewheel_fetch_circuit_open_total',
+                                      'Fetches rejected by an open circuit.')
+
+
+class FetchError(Exception):
+    """Fetch failed."""
+    def __init__(self, message, status_code=None, retryable=True):
+        """Constructor
+
+        :param str message: Error message
+        :param int status_code: HTTP status code, if there was a response.
+        :param bool retryable: True if trying again might work.
+        """
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+class DeadlineExceededError(FetchError):
+    """Ran out of time before getting a response."""
+    def __init__(self, message):
+        super().__init__(message, retryable=False)
+
+
+class LatencyTracker:
+    """Recent latencies, for the hedging delay."""
+    def __init__(self, window=LATENCY_WINDOW):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        """Records a latency."""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def percentile(self, percent, min_samples=HEDGE_MIN_SAMPLES):
+        """Returns the latency at percent, or None if too few samples.
+
+        :rtype: float or None
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies or len(latencies) < min_samples:
+            return None
+        index = min(len(latencies) - 1, len(latencies) * percent // 100)
+        return latencies[index]
+
+
+class CircuitBreaker:
+    """Fails fast after consecutive failures."""
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, clock=time.monotonic):
+        """Constructor
+
+        :param int failure_threshold: Consecutive failures that open it.
+        :param float reset_timeout: Seconds before letting a test through.
+        :param clock: Returns seconds.  For tests.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._clock = clock
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """Returns True if requests are being rejected."""
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """Returns True if a request may be sent."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._clock() - self._opened_at >= self.reset_timeout:
+                # Half open.  Let this one through, hold the rest back
+                # for another reset_timeout.
+                self._opened_at = self._clock()
+                return True
+            return False
+
+    def record_success(self):
+        """Closes the circuit."""
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        """Counts a failure, opening the circuit at the threshold."""
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+
+
+class Fetcher:
+    """Sends POST requests with timeouts, retries, hedging and a circuit
+    breaker per host."""
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF,
+                 hedge=False, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT):
+        """Constructor
+
+        :param float timeout: Seconds per attempt.
+        :param int retries: Attempts after the first.
+        :param float backoff: Seconds before the first retry.
+        :param float max_backoff: Most seconds between retries.
+        :param bool hedge: Send a duplicate request after the p95 latency.
+        :param int failure_threshold: Consecutive failures that open a
+            host's circuit.
+        :param float reset_timeout: Seconds a circuit stays open.
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latencies = LatencyTracker()
+        self._circuits = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def circuit(self, host):
+        """Returns the circuit breaker for a host.
+
+        :rtype: CircuitBreaker
+        """
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                circuit = self._circuits[host] = \
+                    CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return circuit
+
+    def post(self, url, deadline=None, on_attempt=None, **kwargs):
+        """Sends a POST request.
+
+        :param str url: URL
+        :param thewheel.deadline.Deadline deadline: Optional.  Give up when
+            it expires.
+        :param on_attempt: Optional.  Called with (status code, seconds) after
+            every attempt, including retries and hedges.  The status code is
+            None if there was no response.  Ex: Timeout
+        :param kwargs: Passed to requests.post.  Ex: data, headers
+        :rtype: requests.Response
+        :returns: A successful (2xx) response.
+        :raises DeadlineExceededError: If the deadline expired first.
+        :raises FetchError: If every attempt failed or the circuit is open.
+        """
+        host = urlsplit(url).netloc
+        circuit = self.circuit(host)
+        error = None
+        attempts = 0
+        for attempt in range(self.retries + 1):
+            if attempt:
+                RETRIES.inc(host=host)
+                time.sleep(min(self._backoff_delay(attempt),
+                               thewheel.deadline.remaining(deadline,
+                                                           self.max_backoff)))
+            # Read the deadline once.  A timeout of 0 is rejected by
+            # requests, so it has to be caught here.
+            timeout = min(self.timeout,
+                          thewheel.deadline.remaining(deadline, self.timeout))
+            if timeout <= 0:
+                raise DeadlineExceededError(f'POST {url} ran out of time '
+                                            f'after {attempts} attempt(s)')
+            if not circuit.allow():
+                CIRCUIT_REJECTIONS.inc(host=host)
+                if error is None:
+                    raise FetchError(f'Circuit open for {host} after '
+                                     f'{circuit.failures} failures',
+                                     retryable=False)
+                break
+            attempts += 1
+            try:
+                response = self._hedged_post(url, kwargs, timeout, deadline,
+                                             on_attempt)
+            except FetchError as fetch_error:
+                error = fetch_error
+            else:
+                circuit.record_success()
+                return response
+            if deadline is not None and deadline.expired:
+                # Cut short by the deadline, not the host's fault.
+                continue
+            if not error.retryable:
+                # The host answered, so it is up.
+                circuit.record_success()
+                break
+            circuit.record_failure()
+
+        if deadline is not None and deadline.expired:
+            raise DeadlineExceededError(f'POST {url} ran out of time '
+                                        f'after {attempts} attempt(s): '
+                                        f'{str(error)}')
+        raise FetchError(f'POST {url} failed after {attempts} '
+                         f'attempt(s): {str(error)}',
+                         error.status_code, error.retryable)
+
+    def _backoff_delay(self, attempt):
+        """Full jitter: random up to backoff * 2^(attempt - 1)."""
+        ceiling = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def _hedged_post(self, url, kwargs, timeout, deadline, on_attempt):
+        """One attempt.  May send a duplicate request; first success wins."""
+        delay = None
+        if self.hedge:
+            delay = self.latencies.percentile(HEDGE_PERCENTILE)
+        if delay is None:
+            return self._timed_post(url, kwargs, timeout, on_attempt)
+
+        executor = self._get_executor()
+        pending = {executor.submit(self._timed_post, url, kwargs, timeout,
+                                   on_attempt)}
+        done, pending = wait(pending, timeout=delay)
+        hedge_timeout = min(timeout,
+                            thewheel.deadline.remaining(deadline, timeout))
+        if not done and hedge_timeout > 0:
+            HEDGES.inc(host=urlsplit(url).netloc)
+            pending.add(executor.submit(self._timed_post, url, kwargs,
+                                        hedge_timeout, on_attempt))
+
+        error = None
+        while done or pending:
+            for future in done:
+                try:
+                    return future.result()
+                except FetchError as fetch_error:
+                    error = fetch_error
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        raise error
+
+    def _timed_post(self, url, kwargs, timeout, on_attempt=None):
+        """Sends the request, recording the latency on success."""
+        start = time.perf_counter()
+        try:
+            response = requests.post(url, timeout=timeout, **kwargs)
+        except requests.RequestException as error:
+            if on_attempt is not None:
+                on_attempt(None, time.perf_counter() - start)
+            raise FetchError(f'{type(error).__name__}: {str(error)}') \
+                from error
+        if on_attempt is not None:
+            on_attempt(response.status_code, time.perf_counter() - start)
+        if not response.ok:
+            raise FetchError(f'HTTP {response.status_code} {response.reason}',
+                             response.status_code,
+                             response.status_code in RETRY_STATUS_CODES)
+        self.latencies.add(time.perf_counter() - start)
+        return response
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    thread_name_prefix='thewheel-hedge')
+            return self._executor
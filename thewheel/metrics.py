@@ -0,0 +1,294 @@
+"""Metrics for long running scans.
+
+Counters, gauges and histograms, with labels (ex: symbol).  Dump them on
+demand as Prometheus text or JSON, or serve them on a local scrape endpoint.
+
+Metrics are declared once, at import, on REGISTRY.  REGISTRY is disabled by
+default, in which case recording a value is a single attribute check.
+
+Ex:
+    thewheel.metrics.REGISTRY.enabled = True
+    thewheel.metrics.REGISTRY.serve(9100)
+"""
+import json
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+LATENCY_BUCKETS = (.05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024,
+                4 * 1024 * 1024)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+JSON_CONTENT_TYPE = 'application/json'
+
+
+def _labels_key(labels):
+    """Labels dictionary to a hashable, ordered key."""
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    """Returns labels in Prometheus format.  Ex: {symbol="INTC"}"""
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    text = ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return f'{{{text}}}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _HistogramValue:
+    """Bucket counts, sum and count for one set of labels."""
+    def __init__(self, buckets):
+        self.bucket_counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def cumulative(self):
+        """Returns cumulative bucket counts, as Prometheus expects."""
+        total = 0
+        result = []
+        for bucket_count in self.bucket_counts:
+            total += bucket_count
+            result.append(total)
+        return result
+
+
+class Metric:
+    """A named metric.  Values are kept per set of labels."""
+    def __init__(self, registry, name, kind, help_text, buckets=None):
+        """Constructor
+
+        :param Registry registry: Owner.  Decides if enabled.
+        :param str name: Prometheus name. Ex: thewheel_get_html_seconds
+        :param str kind: COUNTER, GAUGE or HISTOGRAM
+        :param str help_text: Description
+        :param tuple buckets: Upper bounds.  Histograms only.
+        """
+        self.registry = registry
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.buckets = tuple(buckets) if buckets else ()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        """Increments a counter or gauge."""
+        registry = self.registry
+        if not registry.enabled:
+            return
+        key = _labels_key(labels)
+        with registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        """Sets a gauge."""
+        registry = self.registry
+        if not registry.enabled:
+            return
+        with registry.lock:
+            self.values[_labels_key(labels)] = value
+
+    def observe(self, value, **labels):
+        """Records a value in a histogram."""
+        registry = self.registry
+        if not registry.enabled:
+            return
+        key = _labels_key(labels)
+        index = bisect_left(self.buckets, value)
+        with registry.lock:
+            histogram = self.values.get(key)
+            if histogram is None:
+                histogram = self.values[key] = _HistogramValue(self.buckets)
+            if index < len(self.buckets):
+                histogram.bucket_counts[index] += 1
+            histogram.sum += value
+            histogram.count += 1
+
+    def get(self, **labels):
+        """Returns the value for a set of labels.  Mainly for tests.
+
+        :returns: Number, or (count, sum) for histograms. None if never set.
+        """
+        value = self.values.get(_labels_key(labels))
+        if isinstance(value, _HistogramValue):
+            return value.count, value.sum
+        return value
+
+
+class Registry:
+    """Holds all the metrics."""
+    def __init__(self, enabled=False):
+        """Constructor
+
+        :param bool enabled: If False, recording does nothing.
+        """
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self._metrics = {}
+
+    def counter(self, name, help_text):
+        """Declares a counter.
+
+        :rtype: Metric
+        """
+        return self._declare(name, COUNTER, help_text)
+
+    def gauge(self, name, help_text):
+        """Declares a gauge.
+
+        :rtype: Metric
+        """
+        return self._declare(name, GAUGE, help_text)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        """Declares a histogram.
+
+        :rtype: Metric
+        """
+        return self._declare(name, HISTOGRAM, help_text, buckets)
+
+    def _declare(self, name, kind, help_text, buckets=None):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = \
+                Metric(self, name, kind, help_text, buckets)
+        elif metric.kind != kind:
+            raise ValueError(f'Metric {name} already declared as '
+                             f'a {metric.kind}')
+        return metric
+
+    def reset(self):
+        """Clears all recorded values.  Declarations are kept."""
+        with self.lock:
+            for metric in self._metrics.values():
+                metric.values.clear()
+
+    def to_prometheus(self):
+        """Returns all metrics in the Prometheus text format.
+
+        :rtype: str
+        """
+        lines = []
+        with self.lock:
+            for metric in self._metrics.values():
+                lines.append(f'# HELP {metric.name} {metric.help_text}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+                for key, value in metric.values.items():
+                    if metric.kind == HISTOGRAM:
+                        lines.extend(self._histogram_lines(metric, key, value))
+                    else:
+                        lines.append(f'{metric.name}{_format_labels(key)} '
+                                     f'{_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histogram_lines(metric, key, value):
+        bounds = list(metric.buckets) + [float('inf')]
+        counts = value.cumulative() + [value.count]
+        for bound, count in zip(bounds, counts):
+            labels = _format_labels(key, [('le', _format_value(bound))])
+            yield f'{metric.name}_bucket{labels} {count}'
+        labels = _format_labels(key)
+        yield f'{metric.name}_sum{labels} {_format_value(value.sum)}'
+        yield f'{metric.name}_count{labels} {value.count}'
+
+    def to_dict(self):
+        """Returns all metrics as JSON serializable dictionaries.
+
+        :rtype: dict
+        """
+        result = {}
+        with self.lock:
+            for metric in self._metrics.values():
+                samples = []
+                for key, value in metric.values.items():
+                    sample = {'labels': dict(key)}
+                    if metric.kind == HISTOGRAM:
+                        sample['buckets'] = dict(
+                            zip([str(bound) for bound in metric.buckets],
+                                value.cumulative()))
+                        sample['sum'] = value.sum
+                        sample['count'] = value.count
+                    else:
+                        sample['value'] = value
+                    samples.append(sample)
+                result[metric.name] = {'type': metric.kind,
+                                       'help': metric.help_text,
+                                       'samples': samples}
+        return result
+
+    def to_json(self):
+        """Returns all metrics as a JSON document.
+
+        :rtype: str
+        """
+        return json.dumps(self.to_dict(), indent=2)
+
+    def dump(self, path):
+        """Writes all metrics to a file.  JSON if path ends with .json,
+        otherwise Prometheus text.
+
+        :param str path: File name
+        """
+        if path.endswith('.json'):
+            contents = self.to_json()
+        else:
+            contents = self.to_prometheus()
+        with open(path, 'w', encoding='utf-8') as metrics_file:
+            metrics_file.write(contents)
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serves /metrics (Prometheus) and /metrics.json on a background
+        thread.
+
+        :param int port: Port.  0 picks a free port.
+        :param str host: Interface.  Local only by default.
+        :rtype: ThreadingHTTPServer
+        :returns: Server.  Call shutdown() to stop.
+        """
+        registry = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):  # pylint: disable=invalid-name
+                if self.path == '/metrics':
+                    body = registry.to_prometheus()
+                    content_type = PROMETHEUS_CONTENT_TYPE
+                elif self.path == '/metrics.json':
+                    body = registry.to_json()
+                    content_type = JSON_CONTENT_TYPE
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                """Keep scrapes out of the scan output."""
+
+        server = ThreadingHTTPServer((host, port), _Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        return server
+
+
+REGISTRY = Registry()
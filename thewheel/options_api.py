@@ -1,11 +1,17 @@
 """Calls the API (or screen scrapes) to get the options chain."""
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import date
 
-import requests
 from bs4 import BeautifulSoup, FeatureNotFound
 
 from thewheel.putcontract import PutContract
+import thewheel.chaincache
 import thewheel.config
+import thewheel.deadline
+import thewheel.fetcher
+import thewheel.metrics
 
 BASE_URL = 'https://www.op' \
            'tionis' \
@@ -23,17 +29,102 @@ STRIKE_COLUMN = 0
 DELTA_COLUMN = 11
 IV_COLUMN = 10
 BID_COLUMN = 2
+ASK_COLUMN = 3
 
 STRIKE_MIDDLE = 24
 STRIKE_RANGE_MINIMUM = 5
 STRIKE_RANGE_MAXIMUM = 23
+STRIKE_MINIMUM = STRIKE_MIDDLE - STRIKE_RANGE_MAXIMUM
+STRIKE_MAXIMUM = STRIKE_MIDDLE + STRIKE_RANGE_MAXIMUM
 DEFAULT_STRIKE_RANGE = 14
 
+# Expiries are selected by expmin/expmax: inclusive indices into the
+# expiration months the page lists (exp_values), not into the expiries.
+# (0, 2) is the first three months with expiries.  The full calendar is
+# fetched in windows of EXPIRY_WINDOW_SIZE months.  EXPIRY_GUESS is the last
+# month assumed before the first page says, and EXPIRY_MAXIMUM the most
+# ever fetched.
+DEFAULT_EXPIRIES = (0, 2)
+EXPIRY_WINDOW_SIZE = 3
+EXPIRY_GUESS = 8
+EXPIRY_MAXIMUM = 47
+DEFAULT_WORKERS = 4
+EXPIRY_MONTHS_PATTERN = re.compile(r"exp_values\[(\d+)\]\s*=\s*'([^']*)'")
+
+# Bump whenever parsing changes what is returned, so cached chains
+# (see thewheel.chaincache) are parsed again.
+PARSER_VERSION = 2
+
+# Sends the requests.  Replace or reconfigure to change timeouts, retries,
+# hedging and the circuit breaker.
+FETCHER = thewheel.fetcher.Fetcher()
+
+# Metrics.  Recorded only when thewheel.metrics.REGISTRY is enabled.
+_METRICS = thewheel.metrics.REGISTRY
+HTML_SECONDS = _METRICS.histogram(
+    'thewheel_get_html_seconds',
+    'get_html latency, including retries and failures.')
+HTML_BYTES = _METRICS.histogram(
+    'thewheel_get_html_bytes', 'get_html response size.',
+    thewheel.metrics.SIZE_BUCKETS)
+HTTP_RESPONSES = _METRICS.counter(
+    'thewheel_http_responses_total',
+    'HTTP attempts by status code, "none" if there was no response.')
+PARSE_SECONDS = _METRICS.histogram(
+    'thewheel_parse_seconds', 'Time to parse an option chain.')
+PARSE_ROWS = _METRICS.counter(
+    'thewheel_parse_rows_total', 'Table rows parsed.')
+PARSE_ROWS_PER_SECOND = _METRICS.gauge(
+    'thewheel_parse_rows_per_second', 'Rows/sec of the last parse.')
+CONTRACTS = _METRICS.counter(
+    'thewheel_contracts_total', 'Contracts returned.')
+ERRORS = _METRICS.counter(
+    'thewheel_options_api_errors_total', 'OptionsAPIException raised.')
+
 
 class OptionsAPIException(Exception):
     """Options API Exception"""
 
 
+class ChainNotFoundException(OptionsAPIException):
+    """The page has no option chain.  Ex: No expiries in the window."""
+
+
+class DeadlineExceededException(OptionsAPIException):
+    """Ran out of time before getting the option chain."""
+
+
+class ChainResult(list):
+    """Contracts for a stock, marked complete or partial.
+
+    A list, so it can be used anywhere the contracts are.
+    """
+    def __init__(self, stock, contracts=(), complete=True, months=None):
+        """Constructor
+
+        :param str stock: Stock symbol
+        :param list[PutContract] contracts: Contracts
+        :param bool complete: False if the deadline cut retrieval short.
+        :param list[str] months: Optional.  Every expiration month the page
+            lists.  Ex: ['May 22', 'Jun 22']
+        """
+        super().__init__(contracts)
+        self.stock = stock
+        self.complete = complete
+        self.months = months
+
+    @property
+    def last_month(self):
+        """Returns the index of the last expiration month, or None if
+        unknown.
+
+        :rtype: int or None
+        """
+        if not self.months:
+            return None
+        return len(self.months) - 1
+
+
 class _State:
     """Simple class to keep track of the state, simplifying
     parameter passing.
@@ -42,20 +133,35 @@ class _State:
         """Constructor"""
         self.expiry_found = False
         self.header_found = False
+        self.rows = 0
+        self.complete = True
 
 
-def get_html(stock, option_type, strike_range):
+def get_html(stock, option_type, strike_range, strikes=None, expiries=None,
+             deadline=None):
     """Gets the HTML document for a stock symbol.
 
     :param str stock: Stock symbol
     :param thewheel.config.OptionType option_type: Put or call.
     :param int strike_range: Strike range
+    :param tuple[int,int] strikes: Optional.  Minimum and maximum strikes.
+        Overrides strike_range.
+    :param tuple[int,int] expiries: Optional.  Minimum and maximum
+        expiration month indices, inclusive.  Defaults to DEFAULT_EXPIRIES.
+    :param thewheel.deadline.Deadline deadline: Optional.  Give up when it
+        expires.
     :rtype: str
     :returns: HTML document
-
-    ?? TODO - Errors and error checking! ??
+    :raises DeadlineExceededException: If the deadline expired first.
+    :raises OptionsAPIException: If the request failed.
     """
-    min_strike, max_strike = get_strike_range(strike_range)
+    if strikes is None:
+        min_strike, max_strike = get_strike_range(strike_range)
+    else:
+        min_strike, max_strike = strikes
+    if expiries is None:
+        expiries = DEFAULT_EXPIRIES
+    min_expiry, max_expiry = expiries
     chtype = get_chtype(option_type)
 
     url = f'{BASE_URL}/{stock}'
@@ -70,8 +176,8 @@ def get_html(stock, option_type, strike_range):
         # 'mn1max': '38',  # Maximum strike range.
         'mn1min': str(min_strike),
         'mn1max': str(max_strike),
-        'expmin': '0',  # ?
-        'expmax': '2',  # ?
+        'expmin': str(min_expiry),
+        'expmax': str(max_expiry),
         'ovmin': '0',  # ?
         'ovmax': '6',  # ?
         'strike': '',  # ?
@@ -84,28 +190,261 @@ def get_html(stock, option_type, strike_range):
         'prevns': ['-1', stock],  # ?
     }
 
-    r = requests.post(url, data=data, headers=HTTP_HEADERS)
-    if r.ok:
-        return r.text
-    else:
-        return None
+    def on_attempt(status_code, _seconds):
+        status = 'none' if status_code is None else str(status_code)
+        HTTP_RESPONSES.inc(symbol=stock, status=status)
 
-
-def get_put_contracts(stock, option_type, strike_range=None):
+    start = time.perf_counter()
+    try:
+        r = FETCHER.post(url, deadline, on_attempt, data=data,
+                         headers=HTTP_HEADERS)
+    except thewheel.fetcher.DeadlineExceededError as error:
+        raise DeadlineExceededException(f'Out of time getting the option '
+                                        f'chain for {stock}: {str(error)}') \
+            from error
+    except thewheel.fetcher.FetchError as error:
+        raise OptionsAPIException(f'Unable to get the option chain for '
+                                  f'{stock}: {str(error)}') from error
+    finally:
+        HTML_SECONDS.observe(time.perf_counter() - start, symbol=stock)
+    HTML_BYTES.observe(len(r.content), symbol=stock)
+    return r.text
+
+
+def get_put_contracts(stock, option_type, strike_range=None, cache=None,
+                      strikes=None, expiries=None, deadline=None):
     """Returns all the put contracts for a stock.
 
     :param str stock: Stock symbol
     :param thewheel.config.OptionType option_type: Put or call.
     :param int strike_range: Strike range
-    :rtype: list[thewheel.putcontract.PutContract]
+    :param thewheel.chaincache.ChainCache cache: Optional.  Skips parsing
+        when the HTML document has not changed.
+    :param tuple[int,int] strikes: Optional.  Minimum and maximum strikes.
+        Overrides strike_range.  See thewheel.strikewindow.
+    :param tuple[int,int] expiries: Optional.  Minimum and maximum
+        expiration month indices, inclusive.  Defaults to DEFAULT_EXPIRIES.
+    :param thewheel.deadline.Deadline deadline: Optional.  When it expires,
+        stop and return what has been parsed, marked partial.
+    :rtype: ChainResult
+    :raises OptionsAPIException: Error
+    """
+    try:
+        contracts = _get_put_contracts(stock, option_type, strike_range,
+                                       cache, strikes, expiries, deadline)
+    except OptionsAPIException:
+        ERRORS.inc(symbol=stock)
+        raise
+    CONTRACTS.inc(len(contracts), symbol=stock)
+    return contracts
+
+
+def _get_put_contracts(stock, option_type, strike_range, cache, strikes,
+                       expiries, deadline):
+    """Fetches and parses, without counting contracts or errors.
+
+    :rtype: ChainResult
     :raises OptionsAPIException: Error
     """
     if strike_range is None:
         strike_range = DEFAULT_STRIKE_RANGE
-    contracts = []
+    try:
+        return _fetch_and_parse(stock, option_type, strike_range, cache,
+                                strikes, expiries, deadline)
+    except DeadlineExceededException:
+        return ChainResult(stock, complete=False)
+
+
+def _fetch_and_parse(stock, option_type, strike_range, cache, strikes,
+                     expiries, deadline):
+    """Fetches and parses, using the cache if there is one."""
+    html_contents = get_html(stock, option_type, strike_range, strikes,
+                             expiries, deadline)
+    result = None
+    key = None
+    if cache is not None:
+        key = thewheel.chaincache.make_key(html_contents, stock, PARSER_VERSION)
+        contracts = cache.get(key)
+        if contracts is not None:
+            result = ChainResult(stock, contracts)
+    if result is None:
+        result = _timed_parse_contracts(html_contents, stock, deadline)
+        if cache is not None and result.complete:
+            cache.put(key, stock, result)
+    result.months = parse_expiry_months(html_contents)
+    return result
+
+
+def parse_expiry_months(html_contents):
+    """Returns the expiration months the page lists, in index order.
+
+    Cheap: a regex over the page's script, not a parse.
+
+    :param str html_contents: HTML document
+    :rtype: list[str]
+    :returns: Ex: ['May 22', 'Jun 22'].  Empty if the page has no list.
+    """
+    months = {int(index): month for index, month
+              in EXPIRY_MONTHS_PATTERN.findall(html_contents)}
+    return [months[index] for index in sorted(months)]
+
+
+def get_calendar_contracts(stock, option_type, strike_range=None, cache=None,
+                           strikes=None, max_workers=DEFAULT_WORKERS,
+                           deadline=None):
+    """Returns the contracts for every expiry, not just the first few.
+
+    The calendar is fetched in windows of EXPIRY_WINDOW_SIZE expiration
+    months, so each request stays small.  Windows are fetched and parsed
+    concurrently, then merged in expiration order.
+
+    Until the first window arrives, the calendar is assumed to end at month
+    EXPIRY_GUESS.  The first window's page lists every expiration month, so
+    windows are then added or cancelled to match.  If a page has no month
+    list, a window with no chain after one with contracts is the end, and a
+    calendar whose last window still had contracts is marked partial.
+
+    :param str stock: Stock symbol
+    :param thewheel.config.OptionType option_type: Put or call.
+    :param int strike_range: Strike range
+    :param thewheel.chaincache.ChainCache cache: Optional.
+    :param tuple[int,int] strikes: Optional.  Minimum and maximum strikes.
+    :param int max_workers: Most requests at once.
+    :param thewheel.deadline.Deadline deadline: Optional.  When it expires,
+        windows not yet fetched are cancelled and the windows done so far
+        are returned, marked partial.
+    :rtype: ChainResult
+    :raises ChainNotFoundException: If a window inside the calendar has no
+        option chain.  Ex: Invalid symbol
+    :raises OptionsAPIException: Error
+    """
+    def fetch(expiries):
+        return _get_put_contracts(stock, option_type, strike_range, cache,
+                                  strikes, expiries, deadline)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {expiries: executor.submit(fetch, expiries)
+                   for expiries in get_expiry_windows()}
+        first = futures[DEFAULT_EXPIRIES]
+        wait([first], timeout=thewheel.deadline.remaining(deadline))
+        last_month = None
+        truncated = False
+        if first.done() and first.exception() is None:
+            last_month = first.result().last_month
+        if last_month is not None:
+            truncated = last_month > EXPIRY_MAXIMUM
+            last_month = min(last_month, EXPIRY_MAXIMUM)
+            needed = get_expiry_windows(maximum=last_month)
+            for expiries in list(futures):
+                if expiries not in needed:
+                    futures.pop(expiries).cancel()
+            for expiries in needed:
+                if expiries not in futures:
+                    futures[expiries] = executor.submit(fetch, expiries)
+        wait(futures.values(), timeout=thewheel.deadline.remaining(deadline))
+    finally:
+        # Don't wait on fetches still running; the deadline bounds them.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    windows = []
+    complete = not truncated
+    found = False
+    for expiries in sorted(futures):
+        future = futures[expiries]
+        if not future.done() or future.cancelled():
+            complete = False
+            continue
+        try:
+            window = future.result()
+        except ChainNotFoundException:
+            if last_month is None and found:
+                # Past the last expiry.  Expected, so not counted.
+                break
+            ERRORS.inc(symbol=stock)
+            raise
+        except OptionsAPIException:
+            ERRORS.inc(symbol=stock)
+            raise
+        found = found or bool(window)
+        complete = complete and window.complete
+        windows.append(window)
+    else:
+        if last_month is None and windows and windows[-1]:
+            # No month list, and the calendar may go on past the guess.
+            complete = False
+    contracts = ChainResult(stock, merge_expiries(windows), complete)
+    CONTRACTS.inc(len(contracts), symbol=stock)
+    return contracts
+
+
+def get_expiry_windows(window_size=EXPIRY_WINDOW_SIZE, maximum=EXPIRY_GUESS):
+    """Splits the expiration month indices into windows.
+
+    expmax is inclusive, so windows don't overlap.
+
+    :param int window_size: Expiration months per window.
+    :param int maximum: Last expiration month index.
+    :rtype: list[tuple[int,int]]
+    """
+    return [(start, min(start + window_size - 1, maximum))
+            for start in range(0, maximum + 1, window_size)]
+
+
+def merge_expiries(windows):
+    """Merges contracts from several windows into one chain, ordered by
+    expiration.  An expiration in more than one window is only kept once.
+
+    :param list[list[thewheel.putcontract.PutContract]] windows: Contracts
+        from each window.
+    :rtype: list[thewheel.putcontract.PutContract]
+    """
+    by_expiration = {}
+    for contracts in windows:
+        seen = set()
+        for contract in contracts:
+            expiration = contract.expiration
+            if expiration not in by_expiration:
+                by_expiration[expiration] = []
+                seen.add(expiration)
+            if expiration in seen:
+                by_expiration[expiration].append(contract)
+    merged = []
+    for expiration in sorted(by_expiration):
+        merged.extend(by_expiration[expiration])
+    return merged
+
+
+def _timed_parse_contracts(html_contents, stock, deadline):
+    """parse_contracts(), recording parse metrics."""
     state = _State()
+    start = time.perf_counter()
+    contracts = parse_contracts(html_contents, stock, state, deadline)
+    if _METRICS.enabled:
+        elapsed = time.perf_counter() - start
+        PARSE_SECONDS.observe(elapsed, symbol=stock)
+        PARSE_ROWS.inc(state.rows, symbol=stock)
+        if elapsed > 0:
+            PARSE_ROWS_PER_SECOND.set(state.rows / elapsed, symbol=stock)
+    return ChainResult(stock, contracts, state.complete)
+
+
+def parse_contracts(html_contents, stock, state=None, deadline=None):
+    """Parses the HTML document into contracts.
+
+    :param str html_contents: HTML document
+    :param str stock: Stock symbol
+    :param _State state: Optional.  Parse state, for callers that want
+        the row count or completeness afterwards.
+    :param thewheel.deadline.Deadline deadline: Optional.  When it expires,
+        stop at the next expiry and set state.complete to False.
+    :rtype: list[thewheel.putcontract.PutContract]
+    :raises OptionsAPIException: Error
+    """
+    contracts = []
+    if state is None:
+        state = _State()
 
-    html_contents = get_html(stock, option_type, strike_range)
     try:
         soup = BeautifulSoup(html_contents, 'lxml')
     except FeatureNotFound as error:
@@ -114,14 +453,21 @@ def get_put_contracts(stock, option_type, strike_range=None):
         soup = BeautifulSoup(html_contents, 'html.parser')
 
     option_date, parent_table = _find_option_chain_table(soup)
+    if parent_table is None:
+        raise ChainNotFoundException(f'Unable to find the option chain '
+                                     f'table for {stock}')
 
     # Everything is in one big table.
     for tr in parent_table.find_all('tr'):
+        state.rows += 1
         # row 0: colspan
         # row 1: expiry
         # row 2: headers
         # rows 3+: options
         if not state.expiry_found:
+            if deadline is not None and deadline.expired:
+                state.complete = False
+                break
             option_date = _find_expiry(state, option_date, tr)
         elif state.expiry_found and not state.header_found:
             state.header_found = True
@@ -194,8 +540,9 @@ def _build_contract_from_row(contracts, state, option_date, stock, tr):
         delta = float(column_values[DELTA_COLUMN])
         implied_vol = float(column_values[IV_COLUMN])
         bid = float(column_values[BID_COLUMN])
+        ask = float(column_values[ASK_COLUMN])
         contract = PutContract(stock, option_date,
-                               strike, delta, implied_vol, bid)
+                               strike, delta, implied_vol, bid, ask)
         contracts.append(contract)
 
 
@@ -17,7 +17,8 @@ DELTA_PRECISION = 2
 
 class PutContract:
     """Models selling a put contract."""
-    def __init__(self, stock, expiration, strike, delta, implied_vol, bid):
+    def __init__(self, stock, expiration, strike, delta, implied_vol, bid,
+                 ask=None):
         """Constructor
 
         :param str stock: Name of stock (symbol)
@@ -26,6 +27,7 @@ class PutContract:
         :param float delta: Delta
         :param float implied_vol: Implied Volatility (IV)
         :param float bid: Current bid
+        :param float ask: Current ask.  None if unknown.
         """
         self.stock = stock
         self.expiration = expiration
@@ -33,6 +35,7 @@ class PutContract:
         self.delta = delta
         self.implied_vol = implied_vol
         self.bid = bid
+        self.ask = ask
 
     @property
     def premium_percent(self) -> float:
@@ -44,6 +47,14 @@ class PutContract:
         """Returns the premium, in dollars."""
         return self.bid * 100
 
+    @property
+    def buy_price(self) -> float:
+        """Returns the price to buy the contract at, per share: the ask, or
+        the bid if the ask is unknown."""
+        if self.ask is None:
+            return self.bid
+        return self.ask
+
     @property
     def cost(self) -> float:
         """Returns the cost of the contract."""
@@ -0,0 +1,262 @@
+"""Finds roll candidates for open short option positions.
+
+Rolling buys back the option sold and sells one with a later expiry and the
+same or a better strike (lower for puts, higher for calls) for a net credit.
+
+Every position on the same stock and side shares one chain, fetched once.
+Each chain is indexed by expiration, with sorted strikes, so the targets for
+a position are found with bisect instead of scanning the chain.
+
+The contract bought back is priced at the ask and the contract sold at the
+bid, so a roll for a credit is a credit at the quoted prices.
+"""
+import csv
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import thewheel.config
+import thewheel.options_api
+
+DEFAULT_TOP = 3
+DEFAULT_MIN_CREDIT = .01
+DEFAULT_WORKERS = 4
+
+STOCK_PADDING = 5
+STRIKE_PADDING = 7
+STRIKE_PRECISION = 2
+
+# Columns in the positions file.
+POSITION_COLUMNS = ['symbol', 'strike', 'expiration', 'side', 'premium']
+
+
+class Position:
+    """Models an open short option position."""
+    def __init__(self, stock, strike, expiration, option_type, premium):
+        """Constructor
+
+        :param str stock: Name of stock (symbol)
+        :param float strike: Strike price
+        :param date expiration: Expiration date of the contract
+        :param thewheel.config.OptionType option_type: Put or call.
+        :param float premium: Premium received when opened, per share.
+        """
+        self.stock = stock
+        self.strike = strike
+        self.expiration = expiration
+        self.option_type = option_type
+        self.premium = premium
+
+    def __str__(self) -> str:
+        """Class as a printable string."""
+        return f'{self.stock:{STOCK_PADDING}}: ' \
+               f'{self.option_type.value:4} {self.expiration} ' \
+               f'Strike={self.strike:{STRIKE_PADDING}.{STRIKE_PRECISION}f} ' \
+               f'Premium={self.premium * 100:4.0f}'
+
+
+class RollCandidate:
+    """Models rolling a position to a new contract."""
+    def __init__(self, position, current, target):
+        """Constructor
+
+        :param Position position: Position rolled.
+        :param thewheel.putcontract.PutContract current: The position's
+            contract, in the chain.  Bought back.
+        :param thewheel.putcontract.PutContract target: Contract sold.
+        """
+        self.position = position
+        self.current = current
+        self.target = target
+        self.net_credit = target.bid - current.buy_price
+
+    @property
+    def total_credit(self) -> float:
+        """Returns the premium from opening plus the roll, in dollars."""
+        return (self.position.premium + self.net_credit) * 100
+
+    def __str__(self) -> str:
+        """Class as a printable string."""
+        return f'    -> {self.target.expiration} ' \
+               f'Strike={self.target.strike:{STRIKE_PADDING}.{STRIKE_PRECISION}f} ' \
+               f'Credit={self.net_credit * 100:4.0f} ' \
+               f'Total={self.total_credit:5.0f} ' \
+               f'Delta={self.target.delta:5.2f}'
+
+
+class PositionRolls:
+    """Roll candidates for one position."""
+    def __init__(self, position, candidates, complete=True, error=None):
+        """Constructor
+
+        :param Position position: Position
+        :param list[RollCandidate] candidates: Best first.
+        :param bool complete: False if the chain was partial.
+        :param str error: Why there are no candidates.  Ex: Chain failed.
+        """
+        self.position = position
+        self.candidates = candidates
+        self.complete = complete
+        self.error = error
+
+    def __str__(self) -> str:
+        """Class as a printable string."""
+        lines = [str(self.position)]
+        if self.error is not None:
+            lines.append(f'    {self.error}')
+        elif not self.candidates:
+            lines.append('    No roll for a credit.')
+        lines.extend(str(candidate) for candidate in self.candidates)
+        if not self.complete:
+            lines.append('    Partial: the deadline cut the chain short.')
+        return '\n'.join(lines)
+
+
+class ChainIndex:
+    """A chain indexed by expiration, with sorted strikes."""
+    def __init__(self, contracts):
+        """Constructor
+
+        :param list[thewheel.putcontract.PutContract] contracts: One chain.
+        """
+        by_expiration = {}
+        for contract in contracts:
+            by_expiration.setdefault(contract.expiration, []).append(contract)
+        self.expirations = sorted(by_expiration)
+        self._contracts = {}
+        self._strikes = {}
+        for expiration, expiry in by_expiration.items():
+            expiry.sort(key=lambda contract: contract.strike)
+            self._contracts[expiration] = expiry
+            self._strikes[expiration] = [contract.strike for contract in expiry]
+
+    def find(self, expiration, strike):
+        """Returns the contract, or None if not in the chain.
+
+        :rtype: thewheel.putcontract.PutContract or None
+        """
+        strikes = self._strikes.get(expiration)
+        if strikes is None:
+            return None
+        index = bisect_left(strikes, strike)
+        if index < len(strikes) and strikes[index] == strike:
+            return self._contracts[expiration][index]
+        return None
+
+    def later(self, expiration, strike, option_type):
+        """Yields contracts expiring after expiration with the same or a
+        better strike: at or below for puts, at or above for calls."""
+        start = bisect_right(self.expirations, expiration)
+        for later_expiration in self.expirations[start:]:
+            expiry = self._contracts[later_expiration]
+            strikes = self._strikes[later_expiration]
+            if option_type is thewheel.config.OptionType.PUT:
+                yield from expiry[:bisect_right(strikes, strike)]
+            else:
+                yield from expiry[bisect_left(strikes, strike):]
+
+
+def read_positions(path):
+    """Reads positions from a CSV file.
+
+    Columns: symbol, strike, expiration (YYYY-MM-DD), side (put or call),
+    premium (per share).  Ex: INTC,45,2022-05-20,put,0.75
+
+    :param str path: File name
+    :rtype: list[Position]
+    :raises ValueError: If a row is invalid.
+    """
+    positions = []
+    with open(path, newline='', encoding='utf-8') as positions_file:
+        for line, row in enumerate(csv.DictReader(positions_file), start=2):
+            try:
+                positions.append(Position(
+                    row['symbol'].strip().upper(),
+                    float(row['strike']),
+                    date.fromisoformat(row['expiration'].strip()),
+                    thewheel.config.OptionType(row['side'].strip().lower()),
+                    float(row['premium'])))
+            except (KeyError, TypeError, ValueError) as error:
+                raise ValueError(f'{path} line {line}: Invalid position '
+                                 f'{row}: {str(error)}') from error
+    return positions
+
+
+def find_rolls(positions, index, top=DEFAULT_TOP,
+               min_credit=DEFAULT_MIN_CREDIT, max_delta=None):
+    """Ranks roll targets for positions on one chain.
+
+    :param list[Position] positions: Positions on the chain's stock and side.
+    :param ChainIndex index: The chain.
+    :param int top: Most candidates per position.
+    :param float min_credit: Least net credit, per share.
+    :param float max_delta: Optional.  Most absolute delta of the target.
+    :rtype: list[PositionRolls]
+    """
+    results = []
+    for position in positions:
+        current = index.find(position.expiration, position.strike)
+        if current is None:
+            results.append(PositionRolls(position, [],
+                                         error='Not found in the chain.'))
+            continue
+        candidates = []
+        for target in index.later(position.expiration, position.strike,
+                                  position.option_type):
+            if target.bid - current.buy_price < min_credit:
+                continue
+            if max_delta is not None and abs(target.delta) > max_delta:
+                continue
+            candidates.append(RollCandidate(position, current, target))
+        # Most credit first, then the least risky.
+        candidates.sort(key=lambda candidate: (-candidate.net_credit,
+                                               abs(candidate.target.delta)))
+        results.append(PositionRolls(position, candidates[:top]))
+    return results
+
+
+def get_roll_candidates(positions, strike_range=None, cache=None,
+                        deadline=None, top=DEFAULT_TOP,
+                        min_credit=DEFAULT_MIN_CREDIT, max_delta=None,
+                        max_workers=DEFAULT_WORKERS):
+    """Fetches each stock and side's chain once and ranks roll targets for
+    every position.
+
+    :param list[Position] positions: Open positions.
+    :param int strike_range: Strike range
+    :param thewheel.chaincache.ChainCache cache: Optional.
+    :param thewheel.deadline.Deadline deadline: Optional.
+    :param int top: Most candidates per position.
+    :param float min_credit: Least net credit, per share.
+    :param float max_delta: Optional.  Most absolute delta of the target.
+    :param int max_workers: Most chains fetched at once.
+    :rtype: list[PositionRolls]
+    :returns: In the same order as positions.
+    """
+    by_chain = {}
+    for position in positions:
+        by_chain.setdefault((position.stock, position.option_type),
+                            []).append(position)
+
+    def fetch(key):
+        stock, option_type = key
+        return thewheel.options_api.get_calendar_contracts(
+            stock, option_type, strike_range, cache, deadline=deadline)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {key: executor.submit(fetch, key) for key in by_chain}
+        for key, future in futures.items():
+            chain_positions = by_chain[key]
+            try:
+                contracts = future.result()
+            except thewheel.options_api.OptionsAPIException as error:
+                for position in chain_positions:
+                    results[id(position)] = PositionRolls(
+                        position, [], error=str(error))
+                continue
+            for rolls in find_rolls(chain_positions, ChainIndex(contracts),
+                                    top, min_credit, max_delta):
+                rolls.complete = contracts.complete
+                results[id(rolls.position)] = rolls
+    return [results[id(position)] for position in positions]
@@ -0,0 +1,216 @@
+"""Builds spread and collar candidates from parsed option chains.
+
+Credit spreads sell one option and buy a further out of the money option
+of the same type and expiry:
+
+* Bull put spread: sell the higher strike put, buy the lower strike put.
+* Bear call spread: sell the lower strike call, buy the higher strike call.
+
+The short leg must be out of the money (delta under max_short_delta).  An in
+the money short leg has a credit near the width, so its return on risk looks
+huge, but it is almost sure to lose the most.
+
+Collars buy a put and sell a call, of the same expiry, around stock already
+owned.  Both legs must be out of the money (delta under max_leg_delta), with
+the call strike above the put strike.  Collars are ranked by net cost as a
+percentage of the put strike, the price protected.
+
+Only pairs within max_width of each other are looked at.  Strikes are sorted
+once per expiry, so the long legs for each short leg are a slice found with
+bisect rather than every pair.  The best candidates are kept in a bounded
+heap, so the pairs are never all held at once.
+
+Options sold are priced at the bid and options bought at the ask (see
+PutContract.buy_price), so credits are what the quotes would fill at.
+"""
+import heapq
+from bisect import bisect_left, bisect_right
+from itertools import groupby
+
+import thewheel.config
+
+DEFAULT_TOP = 20
+DEFAULT_MAX_WIDTH = 5.0
+DEFAULT_MIN_CREDIT_RATIO = .2
+DEFAULT_MAX_NET_DELTA = .3
+DEFAULT_MAX_LEG_DELTA = .5    # Out of the money.
+
+STOCK_PADDING = 5
+STRIKE_PADDING = 7
+STRIKE_PRECISION = 2
+
+
+class Spread:
+    """Models a vertical credit spread, per share."""
+    def __init__(self, short, long):
+        """Constructor
+
+        :param thewheel.putcontract.PutContract short: Option sold.
+        :param thewheel.putcontract.PutContract long: Option bought.
+        """
+        self.short = short
+        self.long = long
+        self.width = abs(short.strike - long.strike)
+        self.credit = short.bid - long.buy_price
+        self.net_delta = long.delta - short.delta
+
+    @property
+    def max_loss(self) -> float:
+        """Returns the most that can be lost, in dollars."""
+        return (self.width - self.credit) * 100
+
+    @property
+    def return_on_risk(self) -> float:
+        """Returns the credit as a fraction of the max loss."""
+        risk = self.width - self.credit
+        if risk <= 0:
+            return float('inf')
+        return self.credit / risk
+
+    def __str__(self) -> str:
+        """Class as a printable string."""
+        return f'{self.short.stock:{STOCK_PADDING}}: ' \
+               f'{self.short.expiration} ' \
+               f'Short={self.short.strike:{STRIKE_PADDING}.{STRIKE_PRECISION}f} ' \
+               f'Long={self.long.strike:{STRIKE_PADDING}.{STRIKE_PRECISION}f} ' \
+               f'Credit={self.credit * 100:4.0f} ' \
+               f'MaxLoss={self.max_loss:5.0f} ' \
+               f'RoR={self.return_on_risk * 100:6.2f}% ' \
+               f'Delta={self.net_delta:5.2f}'
+
+
+class Collar:
+    """Models a collar on 100 shares: buy a put, sell a call."""
+    def __init__(self, put, call):
+        """Constructor
+
+        :param thewheel.putcontract.PutContract put: Put bought.
+        :param thewheel.putcontract.PutContract call: Call sold.
+        """
+        self.put = put
+        self.call = call
+        self.width = call.strike - put.strike
+        self.net_cost = put.buy_price - call.bid
+
+    @property
+    def cost_percent(self) -> float:
+        """Returns the net cost as a percentage of the put strike.
+        Negative for a credit."""
+        return self.net_cost / self.put.strike * 100
+
+    def __str__(self) -> str:
+        """Class as a printable string."""
+        return f'{self.put.stock:{STOCK_PADDING}}: ' \
+               f'{self.put.expiration} ' \
+               f'Put={self.put.strike:{STRIKE_PADDING}.{STRIKE_PRECISION}f} ' \
+               f'Call={self.call.strike:{STRIKE_PADDING}.{STRIKE_PRECISION}f} ' \
+               f'Cost={self.net_cost * 100:5.0f} {self.cost_percent:6.2f}% ' \
+               f'Delta={self.put.delta:5.2f}/{self.call.delta:5.2f}'
+
+
+def build_credit_spreads(contracts, option_type,
+                         max_width=DEFAULT_MAX_WIDTH,
+                         min_credit_ratio=DEFAULT_MIN_CREDIT_RATIO,
+                         max_net_delta=DEFAULT_MAX_NET_DELTA,
+                         max_short_delta=DEFAULT_MAX_LEG_DELTA,
+                         top=DEFAULT_TOP):
+    """Returns the best credit spreads, by return on risk.
+
+    :param list[thewheel.putcontract.PutContract] contracts: One chain.
+        All puts or all calls.
+    :param thewheel.config.OptionType option_type: PUT for bull put
+        spreads, CALL for bear call spreads.
+    :param float max_width: Most dollars between the strikes.
+    :param float min_credit_ratio: Least credit / width.
+    :param float max_net_delta: Most absolute net delta.
+    :param float max_short_delta: Absolute delta the short leg must be under.
+    :param int top: Number of spreads returned.
+    :rtype: list[Spread]
+    :returns: Best first.
+    """
+    if top < 1:
+        return []
+    is_put = option_type is thewheel.config.OptionType.PUT
+    best = []
+    count = 0
+    for expiry in _by_expiry(contracts):
+        strikes = [contract.strike for contract in expiry]
+        for short in expiry:
+            if abs(short.delta) >= max_short_delta:
+                continue
+            # Long leg is further out of the money.
+            if is_put:
+                low = bisect_left(strikes, short.strike - max_width)
+                high = bisect_left(strikes, short.strike)
+            else:
+                low = bisect_right(strikes, short.strike)
+                high = bisect_right(strikes, short.strike + max_width)
+            for index in range(low, high):
+                long = expiry[index]
+                width = abs(short.strike - long.strike)
+                credit = short.bid - long.buy_price
+                if credit < min_credit_ratio * width or credit <= 0:
+                    continue
+                if abs(long.delta - short.delta) > max_net_delta:
+                    continue
+                spread = Spread(short, long)
+                count += 1
+                # count breaks ties, so Spreads are never compared.
+                item = (spread.return_on_risk, count, spread)
+                if len(best) < top:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+    return [spread for _, _, spread in sorted(best, reverse=True)]
+
+
+def build_collars(puts, calls, max_width=DEFAULT_MAX_WIDTH,
+                  max_leg_delta=DEFAULT_MAX_LEG_DELTA, top=DEFAULT_TOP):
+    """Returns the best collars, by net cost for the protection.
+
+    :param list[thewheel.putcontract.PutContract] puts: Put chain.
+    :param list[thewheel.putcontract.PutContract] calls: Call chain for the
+        same stock.
+    :param float max_width: Most dollars between the put and call strikes.
+    :param float max_leg_delta: Absolute delta each leg must be under.
+    :param int top: Number of collars returned.
+    :rtype: list[Collar]
+    :returns: Best (lowest cost_percent, then widest) first.
+    """
+    if top < 1:
+        return []
+    calls_by_expiry = {}
+    for expiry in _by_expiry(calls):
+        out_of_the_money = [call for call in expiry
+                            if abs(call.delta) < max_leg_delta]
+        if out_of_the_money:
+            calls_by_expiry[expiry[0].expiration] = out_of_the_money
+    best = []
+    count = 0
+    for put_expiry in _by_expiry(puts):
+        call_expiry = calls_by_expiry.get(put_expiry[0].expiration)
+        if call_expiry is None:
+            continue
+        call_strikes = [call.strike for call in call_expiry]
+        for put in put_expiry:
+            if abs(put.delta) >= max_leg_delta:
+                continue
+            low = bisect_right(call_strikes, put.strike)
+            high = bisect_right(call_strikes, put.strike + max_width)
+            for index in range(low, high):
+                collar = Collar(put, call_expiry[index])
+                count += 1
+                item = (-collar.cost_percent, collar.width, count, collar)
+                if len(best) < top:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+    return [collar for *_, collar in sorted(best, reverse=True)]
+
+
+def _by_expiry(contracts):
+    """Yields the contracts for each expiry, sorted by strike."""
+    ordered = sorted(contracts,
+                     key=lambda contract: (contract.expiration, contract.strike))
+    for _, group in groupby(ordered, key=lambda contract: contract.expiration):
+        yield list(group)
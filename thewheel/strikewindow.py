@@ -0,0 +1,198 @@
+"""Adaptive strike window.
+
+get_strike_range() asks for a symmetric window around the money, but with a
+delta target most of those rows are thrown away.  StrikeWindows remembers, per
+stock and option type, which strikes last contained the delta band, so the
+next request only asks for those plus some padding.
+
+Strikes are the indices sent to the API (mn1min/mn1max), where
+options_api.STRIKE_MIDDLE is at the money.  The number of rows per expiry
+varies, so each row's strike index is found relative to the at the money row
+(delta closest to 0.5).  For that reason the window always includes
+STRIKE_MIDDLE.
+
+If the band lands on the edge of the window, contracts in the band may have
+been cut off, so the window is widened and the chain fetched again.
+
+Windows can be saved to and loaded from a JSON file, so they carry over from
+one run to the next.
+"""
+import json
+import os
+import tempfile
+from itertools import groupby
+
+import thewheel.config
+import thewheel.options_api
+
+DEFAULT_PADDING = 2
+AT_THE_MONEY_DELTA = .5
+
+
+class StrikeWindows:
+    """Remembers the strike window for each stock and option type."""
+    def __init__(self, padding=DEFAULT_PADDING,
+                 strike_range=thewheel.options_api.DEFAULT_STRIKE_RANGE):
+        """Constructor
+
+        :param int padding: Extra strikes on each side of the band.
+        :param int strike_range: Strike range used before anything is
+            known about a stock.
+        """
+        self.padding = padding
+        self.strike_range = strike_range
+        self._windows = {}
+
+    def window(self, stock, option_type):
+        """Returns the strikes to request.
+
+        :param str stock: Stock symbol
+        :param thewheel.config.OptionType option_type: Put or call.
+        :rtype: int,int
+        :returns: minimum and maximum strikes.
+        """
+        window = self._windows.get((stock, option_type))
+        if window is None:
+            window = thewheel.options_api.get_strike_range(self.strike_range)
+        return window
+
+    def forget(self, stock, option_type):
+        """Goes back to the default window for a stock."""
+        self._windows.pop((stock, option_type), None)
+
+    def load(self, path):
+        """Loads windows saved by save().  A missing or invalid file is
+        ignored, leaving the default windows.
+
+        :param str path: File name
+        """
+        try:
+            with open(path, encoding='utf-8') as windows_file:
+                saved = json.load(windows_file)
+            windows = {}
+            for key, (min_strike, max_strike) in saved.items():
+                stock, option_type = key.rsplit(':', 1)
+                windows[(stock, thewheel.config.OptionType(option_type))] = \
+                    _clip(int(min_strike), int(max_strike))
+        except (OSError, ValueError, TypeError, AttributeError):
+            return
+        self._windows.update(windows)
+
+    def save(self, path):
+        """Saves the windows.  Atomic, so a reader never sees a partial file.
+
+        :param str path: File name
+        """
+        saved = {f'{stock}:{option_type.value}': list(window)
+                 for (stock, option_type), window in self._windows.items()}
+        try:
+            handle, temp_path = tempfile.mkstemp(
+                dir=os.path.dirname(path) or '.', suffix='.tmp')
+            with os.fdopen(handle, 'w', encoding='utf-8') as windows_file:
+                json.dump(saved, windows_file, indent=1, sort_keys=True)
+            os.replace(temp_path, path)
+        except OSError as error:
+            print(f'Warning: Unable to save strike windows: {str(error)}')
+
+    def update(self, stock, option_type, strikes, contracts,
+               delta, delta_range):
+        """Remembers the window for the contracts in the delta band.
+
+        :param str stock: Stock symbol
+        :param thewheel.config.OptionType option_type: Put or call.
+        :param tuple[int,int] strikes: Strikes that were requested.
+        :param list[thewheel.putcontract.PutContract] contracts: Contracts
+            returned for strikes.
+        :param float delta: Delta
+        :param float delta_range: Range for delta.
+        :rtype: tuple[int,int] or None
+        :returns: Wider strikes to request again, or None if none of the
+            band was cut off.
+        """
+        min_strike, max_strike = strikes
+        band_min = None
+        band_max = None
+        for offset, contract in _strike_offsets(contracts):
+            if contract.is_delta_in_range(delta, delta_range):
+                strike = thewheel.options_api.STRIKE_MIDDLE + offset
+                band_min = strike if band_min is None else min(band_min, strike)
+                band_max = strike if band_max is None else max(band_max, strike)
+
+        default = thewheel.options_api.get_strike_range(self.strike_range)
+        if band_min is None:
+            # Nothing in the band.  Retry with the default window if this
+            # was narrower, so a move in the stock doesn't lose the band.
+            self.forget(stock, option_type)
+            if min_strike > default[0] or max_strike < default[1]:
+                return default
+            return None
+
+        wider_min = min_strike
+        wider_max = max_strike
+        if band_min <= min_strike:
+            wider_min = min_strike - 2 * self.padding
+        if band_max >= max_strike:
+            wider_max = max_strike + 2 * self.padding
+        wider = _clip(wider_min, wider_max)
+        if wider != (min_strike, max_strike):
+            return wider
+
+        self._windows[(stock, option_type)] = \
+            _clip(band_min - self.padding, band_max + self.padding)
+        return None
+
+
+def get_put_contracts(stock, option_type, delta, delta_range, windows,
+                      cache=None, deadline=None, all_expiries=False):
+    """Returns the contracts for a stock, only requesting the strikes
+    around the delta band.
+
+    :param str stock: Stock symbol
+    :param thewheel.config.OptionType option_type: Put or call.
+    :param float delta: Delta
+    :param float delta_range: Range for delta.
+    :param StrikeWindows windows: Remembered windows.  Updated.
+    :param thewheel.chaincache.ChainCache cache: Optional.
+    :param thewheel.deadline.Deadline deadline: Optional.  A partial result
+        is returned as is, without updating windows.
+    :param bool all_expiries: Every expiry, not just the first few.
+    :rtype: thewheel.options_api.ChainResult
+    :raises OptionsAPIException: Error
+    """
+    get_contracts = thewheel.options_api.get_put_contracts
+    if all_expiries:
+        get_contracts = thewheel.options_api.get_calendar_contracts
+    strikes = windows.window(stock, option_type)
+    while True:
+        contracts = get_contracts(stock, option_type, cache=cache,
+                                  strikes=strikes, deadline=deadline)
+        if not contracts.complete:
+            return contracts
+        wider = windows.update(stock, option_type, strikes, contracts,
+                               delta, delta_range)
+        if wider is None:
+            return contracts
+        strikes = wider
+
+
+def _strike_offsets(contracts):
+    """Yields (offset from at the money, contract).
+
+    Contracts are grouped by expiry, in strike order.
+    """
+    for _, group in groupby(contracts, key=lambda contract: contract.expiration):
+        group = list(group)
+        at_the_money = min(
+            range(len(group)),
+            key=lambda index: abs(abs(group[index].delta) - AT_THE_MONEY_DELTA))
+        for index, contract in enumerate(group):
+            yield index - at_the_money, contract
+
+
+def _clip(min_strike, max_strike):
+    """Keeps strikes within the API limits and around the money."""
+    min_strike = max(thewheel.options_api.STRIKE_MINIMUM,
+                     min(min_strike, thewheel.options_api.STRIKE_MIDDLE))
+    max_strike = min(thewheel.options_api.STRIKE_MAXIMUM,
+                     max(max_strike, thewheel.options_api.STRIKE_MIDDLE))
+    return min_strike, max_strike